@@ -0,0 +1,203 @@
+import sys
+import json
+import time
+import base64
+import hashlib
+import datetime
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from backend import *
+
+# --- API JSON (lecture seule) ---
+# Pour les écrans de couloir et le raccourci mobile : un serveur HTTP à part, sans session
+# ni rerun Streamlit, qui lit les mêmes snapshots par jour que l'interface.
+#   GET /version?date=AAAA-MM-JJ      (version globale et version du jour)
+#   GET /changements?date=&depuis=<version du jour>   (salles et heures modifiées depuis)
+#   GET /etages/<P1..P4>?date=AAAA-MM-JJ&heure=HH:MM
+#   GET /salles/<nom>?date=&heure=
+#   GET /recherche?date=&heure=&duree=<minutes>&equipements=💻,📽️
+#   GET /reservations                 (HTTP Basic : email / mot de passe du compte)
+# Chaque réponse porte un ETag calculé sur la version des données et les paramètres
+# effectifs : un client qui renvoie If-None-Match reçoit un 304 tant que rien n'a bougé.
+# Le serveur garde aussi le corps JSON en mémoire pour la même version.
+# Lancement : python api.py [port] [--hote=ADRESSE] [--taches]  (--taches si l'interface ne tourne pas à côté)
+# Le mot de passe circule en clair (HTTP Basic) : écoute sur 127.0.0.1 par défaut, à exposer
+# derrière un proxy TLS. Après API_ECHECS_TOLERES mots de passe faux pour une IP ou un compte,
+# chaque nouvel échec double l'attente imposée (429 + Retry-After), jusqu'à API_ATTENTE_MAX s.
+API_PORT = 8502
+API_HOTE = "127.0.0.1"
+API_CACHE_MAX = 2000
+API_ECHECS_TOLERES = 5
+API_ATTENTE_MAX = 300
+_reponses = {}
+_reponses_lock = threading.Lock()
+_echecs = {}
+_echecs_lock = threading.Lock()
+
+def _attente_echecs(cles):
+    # secondes à attendre avant un nouvel essai, 0 si aucune
+    now = time.time()
+    with _echecs_lock: return max(0, max(_echecs.get(k, (0, 0))[1] for k in cles) - now)
+
+def _noter_echec(cles):
+    # cles = (ip, email) : {clé: (échecs consécutifs, bloquée jusqu'à)}
+    now = time.time()
+    with _echecs_lock:
+        if len(_echecs) > API_CACHE_MAX:
+            for k in [k for k, (_, t) in _echecs.items() if t < now - API_ATTENTE_MAX]: del _echecs[k]
+        for k in cles:
+            nb = _echecs.get(k, (0, 0))[0] + 1
+            _echecs[k] = (nb, now + min(API_ATTENTE_MAX, 2 ** (nb - API_ECHECS_TOLERES)) if nb >= API_ECHECS_TOLERES else 0)
+
+def _en_json(obj):
+    if isinstance(obj, datetime.time): return obj.strftime("%H:%M")
+    if isinstance(obj, datetime.date): return obj.strftime("%Y-%m-%d")
+    raise TypeError(type(obj).__name__)
+
+def _date_heure(params):
+    maintenant = datetime.datetime.now()
+    d = datetime.datetime.strptime(params["date"], "%Y-%m-%d").date() if params.get("date") else maintenant.date()
+    h = datetime.datetime.strptime(params["heure"], "%H:%M").time() if params.get("heure") else maintenant.time().replace(second=0, microsecond=0)
+    return d, h
+
+def _salle_json(salle, etat, icones):
+    statut, fin, libelle, groupe = etat
+    return {"salle": salle, "statut": statut, "jusqu_a": fin, "libelle": libelle, "groupe_obligatoire": groupe, "icones": icones}
+
+def api_etage(etage, params):
+    if etage not in ("P1", "P2", "P3", "P4"): return None
+    d, h = _date_heure(params)
+    index = get_index_jour(d)
+    groupes = get_salles_etage(etage)
+    equip = get_equipements()
+    niveaux = {}
+    for niveau, lst in groupes.items():
+        etats = analyser_salles(index, lst, h, None)
+        niveaux[niveau] = [_salle_json(s, etats[s], equip.get(s, [])) for s in lst]
+    libres = sum(1 for lst in niveaux.values() for s in lst if s["statut"] == "vert")
+    return {"etage": etage, "date": d, "heure": h, "force_groupe": get_admin_config_groupe(), "libres": libres, "niveaux": niveaux}
+
+def api_salle(salle, params):
+    d, h = _date_heure(params)
+    index = get_index_jour(d)
+    _, etage, niveau = classer_salle(salle)
+    journee = {f"{hh}h": analyser_salle(index, salle, datetime.time(hh, 0), None)[0] for hh in range(8, 20)}
+    return dict(_salle_json(salle, analyser_salle(index, salle, h, None), get_equipements().get(salle, [])),
+                etage=etage, niveau=niveau, date=d, heure=h, prochain_libre=prochain_creneau_libre(index, salle, h), journee=journee)
+
+def api_recherche(params):
+    d, h = _date_heure(params)
+    duree = int(params.get("duree") or 60)
+    equipements = [e for e in (params.get("equipements") or "").split(",") if e]
+    return {"date": d, "heure": h, "duree": duree, "equipements": equipements,
+            "salles": rechercher_salles_libres(d, h, duree, equipements)}
+
+def api_changements(params):
+    # "version" de la réponse = version globale ; le client repasse version_jour dans ?depuis=
+    d, _ = _date_heure(params)
+    depuis = int(params.get("depuis") or 0)
+    changements = get_changements_depuis(d, depuis)
+    return {"date": d, "depuis": depuis, "version_jour": changements["version"], "tout": changements["tout"], "salles": changements["salles"]}
+
+def api_reservations(email):
+    cols = ("salle", "date", "debut", "fin", "confirmes", "id", "participants", "createur")
+    resas = [dict(zip(cols, r)) for r in get_mes_reservations_futures(email)]
+    for r in resas:
+        r["participants"] = [p for p in r["participants"].split(",") if p]
+        r["confirmes"] = [p for p in r["confirmes"].split(",") if p]
+    return {"email": email, "reservations": resas}
+
+class HandlerAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # en-têtes et corps partent en deux écritures : sans TCP_NODELAY, le corps attend l'ACK retardé (~40 ms)
+    disable_nagle_algorithm = True
+
+    def _repondre(self, code, corps=b"", etag=None, entetes=()):
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if etag: self.send_header("ETag", etag)
+        for k, v in entetes: self.send_header(k, v)
+        self.end_headers()
+        if corps: self.wfile.write(corps)
+
+    def _erreur(self, code, msg, entetes=()):
+        self._repondre(code, json.dumps({"erreur": msg}, ensure_ascii=False).encode(), entetes=entetes)
+
+    def _utilisateur(self):
+        # HTTP Basic -> (email si le couple email / mot de passe est valide, secondes d'attente imposées)
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("Basic "): return None, 0
+        try: email, _, password = base64.b64decode(auth[6:]).decode().partition(":")
+        except Exception: return None, 0
+        cles = (self.client_address[0], email.strip().lower())
+        attente = _attente_echecs(cles)
+        if attente: return None, attente
+        if email != "admin" and verifier_connexion(email, password)[0]:
+            with _echecs_lock: _echecs.pop(cles[1], None)
+            return email, 0
+        _noter_echec(cles)
+        return None, 0
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        morceaux = [urllib.parse.unquote(m) for m in url.path.strip("/").split("/") if m]
+        route = morceaux[0] if morceaux else ""
+        try:
+            if route == "version" and len(morceaux) == 1: calcul = lambda: {"version_jour": get_version_jour(_date_heure(params)[0])}
+            elif route == "changements" and len(morceaux) == 1: calcul = lambda: api_changements(params)
+            elif route == "etages" and len(morceaux) == 2: calcul = lambda: api_etage(morceaux[1], params)
+            elif route == "salles" and len(morceaux) == 2: calcul = lambda: api_salle(morceaux[1], params)
+            elif route == "recherche" and len(morceaux) == 1: calcul = lambda: api_recherche(params)
+            elif route == "reservations" and len(morceaux) == 1:
+                email, attente = self._utilisateur()
+                if attente: return self._erreur(429, "Trop d'essais, réessayez plus tard.", [("Retry-After", str(int(attente) + 1))])
+                if not email: return self._erreur(401, "Authentification requise.", [("WWW-Authenticate", 'Basic realm="radar"')])
+                calcul = lambda: api_reservations(email)
+                # la liste part d'aujourd'hui : le corps en cache ne survit pas à minuit
+                params = {"email": email, "jour": _en_json(datetime.date.today())}
+            else: return self._erreur(404, "Route inconnue.")
+            # date et heure effectives dans la clé : sans paramètre, "maintenant" change à chaque minute
+            if route in ("version", "changements"): params = dict(params, date=_en_json(_date_heure(params)[0]))
+            if route in ("etages", "salles", "recherche"): params = dict(params, **dict(zip(("date", "heure"), map(_en_json, _date_heure(params)))))
+        except ValueError as e:
+            return self._erreur(400, str(e))
+        with chrono("api", route):
+            version = get_version_donnees()
+            cle = (tuple(morceaux), tuple(sorted(params.items())))
+            with _reponses_lock: entree = _reponses.get(cle)
+            if entree is None or entree[0] < version:
+                try: resultat = calcul()
+                except ValueError as e: return self._erreur(400, str(e))
+                if resultat is None: return self._erreur(404, "Étage inconnu.")
+                corps = json.dumps(dict(resultat, version=version), default=_en_json, ensure_ascii=False).encode()
+                etag = '"%s"' % hashlib.sha1(repr((version, cle)).encode()).hexdigest()[:20]
+                entree = (version, etag, corps)
+                with _reponses_lock:
+                    _reponses.pop(cle, None)
+                    _reponses[cle] = entree
+                    if len(_reponses) > API_CACHE_MAX: _reponses.pop(next(iter(_reponses)))
+            _, etag, corps = entree
+            if etag in self.headers.get("If-None-Match", ""): return self._repondre(304, etag=etag)
+            self._repondre(200, corps, etag)
+
+    def log_message(self, *args):
+        pass
+
+def demarrer_api(port=API_PORT, hote=API_HOTE):
+    srv = ThreadingHTTPServer((hote, port), HandlerAPI)
+    srv.daemon_threads = True
+    return srv
+
+if __name__ == "__main__":
+    init_db()
+    if "--taches" in sys.argv: demarrer_taches_fond()
+    ports = [a for a in sys.argv[1:] if a.isdigit()]
+    hotes = [a.split("=", 1)[1] for a in sys.argv[1:] if a.startswith("--hote=")]
+    srv = demarrer_api(int(ports[0]) if ports else API_PORT, hotes[0] if hotes else API_HOTE)
+    print(f"API radar sur http://{srv.server_address[0]}:{srv.server_port}")
+    srv.serve_forever()
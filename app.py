@@ -1,49 +1,17 @@
 import streamlit as st
-import requests
 import datetime
-import sqlite3
-import hashlib
-import os
 import time
-import random
-
-# --- CONFIGURATION ---
-FICHIER_LIENS = "mes_liens_ade.txt"
-DB_FILE = "radar_upec.db"
-CACHE_TIMEOUT = 1800 
-MAX_QUOTA_HEBDO = 3
-MAX_DUREE_HEURES = 2
-MIN_GROUPE = 5
-MIN_CONFIRMATION_REQUISE = 4
-CHECKIN_TIME_MIN = 15
+from backend import *
 
 st.set_page_config(page_title="Radar UPEC", page_icon="🏢", layout="wide")
 
-# --- INITIALISATION DB ---
-def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users (email TEXT PRIMARY KEY, password TEXT, nom TEXT, ade_url TEXT DEFAULT "")''')
-    c.execute('''CREATE TABLE IF NOT EXISTS reservations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT, 
-        user_email TEXT, 
-        salle TEXT, 
-        date_str TEXT, 
-        start_time TEXT, 
-        end_time TEXT, 
-        participants TEXT DEFAULT "", 
-        confirmed_list TEXT DEFAULT ""
-    )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS admin_locks (salle TEXT PRIMARY KEY, reason TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS restrictions (salle TEXT, date_str TEXT, hour INTEGER, type TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS room_equipment (salle TEXT, icon TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS cache_ade (salle TEXT, debut TEXT, fin TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)''')
-    c.execute("INSERT OR IGNORE INTO metadata (key, value) VALUES ('force_groupe', '0')")
-    conn.commit()
-    conn.close()
+@st.cache_resource(show_spinner=False)
+def demarrage():
+    # une fois par process, pas à chaque rerun
+    init_db()
+    demarrer_taches_fond()
 
-init_db()
+demarrage()
 
 # --- INITIALISATION SESSION ---
 if 'logged_in' not in st.session_state:
@@ -55,6 +23,7 @@ if 'logged_in' not in st.session_state:
 if 'page' not in st.session_state: st.session_state.page = "login"
 if 'etage_choisi' not in st.session_state: st.session_state.etage_choisi = None
 if 'expanded_grp' not in st.session_state: st.session_state.expanded_grp = None
+if 'vu_no_show' not in st.session_state: st.session_state.vu_no_show = time.time()
 
 # --- CSS (V44 - MOBILE & DARK MODE FIX) ---
 def inject_custom_css(page_type="standard"):
@@ -185,416 +154,6 @@ def inject_custom_css(page_type="standard"):
 """
     st.markdown(base_css + custom_css, unsafe_allow_html=True)
 
-# --- BACKEND UTILS ---
-
-JOURS_FR = {0: "Lundi", 1: "Mardi", 2: "Mercredi", 3: "Jeudi", 4: "Vendredi", 5: "Samedi", 6: "Dimanche"}
-MOIS_FR = {1: "Janvier", 2: "Février", 3: "Mars", 4: "Avril", 5: "Mai", 6: "Juin", 7: "Juillet", 8: "Août", 9: "Septembre", 10: "Octobre", 11: "Novembre", 12: "Décembre"}
-
-def format_date_joli(date_obj):
-    return f"{JOURS_FR[date_obj.weekday()]} {date_obj.day} {MOIS_FR[date_obj.month]}"
-
-def hash_password(password):
-    return hashlib.sha256(str.encode(password)).hexdigest()
-
-def verifier_connexion(email, password):
-    if email == "admin" and password == "admin": return ("Administrateur", "")
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT nom, ade_url FROM users WHERE email=? AND password=?", (email, hash_password(password)))
-    result = c.fetchone()
-    conn.close()
-    return result if result else (None, None)
-
-def creer_compte(email, password, nom):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO users (email, password, nom, ade_url) VALUES (?, ?, ?, '')", (email, hash_password(password), nom))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-    finally:
-        conn.close()
-
-def save_ade_url(email, url):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("UPDATE users SET ade_url=? WHERE email=?", (url, email))
-    conn.commit()
-    conn.close()
-
-# --- PARSING ---
-def fetch_and_parse_ical(url):
-    events = []
-    try:
-        r = requests.get(url.strip(), timeout=5)
-        if r.status_code == 200:
-            cours_liste = r.text.split("BEGIN:VEVENT")
-            for cours in cours_liste:
-                if "END:VEVENT" not in cours: continue
-                debut, fin, lieu, summary = None, None, "", ""
-                for ligne in cours.split('\n'):
-                    l = ligne.strip()
-                    if l.startswith("DTSTART:"):
-                        try: debut = datetime.datetime.strptime(l.replace("DTSTART:","").replace("Z","").strip(), '%Y%m%dT%H%M%S')
-                        except: pass
-                    elif l.startswith("DTEND:"):
-                        try: fin = datetime.datetime.strptime(l.replace("DTEND:","").replace("Z","").strip(), '%Y%m%dT%H%M%S')
-                        except: pass
-                    elif l.startswith("LOCATION:"):
-                        lieu = l.replace("LOCATION:", "").replace("\\", "")
-                    elif l.startswith("SUMMARY:"):
-                        summary = l.replace("SUMMARY:", "").replace("\\", "")
-                if debut and fin:
-                    events.append({"titre": summary, "lieu": lieu, "debut": debut, "fin": fin})
-    except: pass
-    return events
-
-def get_mon_planning(raw_urls):
-    if not raw_urls: return []
-    all_events = []
-    urls = [u.strip() for u in raw_urls.split('\n') if u.strip().startswith("http")]
-    for url in urls:
-        events = fetch_and_parse_ical(url)
-        all_events.extend(events)
-    all_events.sort(key=lambda x: x['debut'])
-    return all_events
-
-# --- METIERS ---
-def toggle_equipment(salle, icon):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT icon FROM room_equipment WHERE salle=? AND icon=?", (salle, icon))
-    if c.fetchone(): c.execute("DELETE FROM room_equipment WHERE salle=? AND icon=?", (salle, icon))
-    else: c.execute("INSERT INTO room_equipment VALUES (?, ?)", (salle, icon))
-    conn.commit()
-    conn.close()
-
-def get_room_icons(salle):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT icon FROM room_equipment WHERE salle=?", (salle,))
-    rows = c.fetchall()
-    conn.close()
-    return " " + " ".join([r[0] for r in rows]) if rows else ""
-
-def has_equipment(salle, icon):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT icon FROM room_equipment WHERE salle=? AND icon=?", (salle, icon))
-    res = c.fetchone()
-    conn.close()
-    return res is not None
-
-def get_admin_config_groupe():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT value FROM metadata WHERE key='force_groupe'")
-    res = c.fetchone()
-    conn.close()
-    return res[0] == "1" if res else False
-
-def set_admin_config_groupe(actif: bool):
-    val = "1" if actif else "0"
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("REPLACE INTO metadata (key, value) VALUES ('force_groupe', ?)", (val,))
-    conn.commit()
-    conn.close()
-
-def clean_no_show_reservations():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    today_s = datetime.date.today().strftime("%Y-%m-%d")
-    now = datetime.datetime.now()
-    limit_time = (now - datetime.timedelta(minutes=CHECKIN_TIME_MIN)).strftime("%H:%M")
-    c.execute("SELECT id, user_email, participants, confirmed_list FROM reservations WHERE date_str=? AND start_time < ?", (today_s, limit_time))
-    rows = c.fetchall()
-    for r in rows:
-        res_id, creator, parts_str, conf_str = r
-        all_humans = [creator] + (parts_str.split(',') if parts_str else [])
-        confirmed_humans = conf_str.split(',') if conf_str else []
-        confirmed_humans = [x for x in confirmed_humans if x]
-        nb_confirmed = len(confirmed_humans)
-        if len(all_humans) > 1:
-            if nb_confirmed < MIN_CONFIRMATION_REQUISE:
-                c.execute("DELETE FROM reservations WHERE id=?", (res_id,))
-        else:
-            if nb_confirmed == 0:
-                c.execute("DELETE FROM reservations WHERE id=?", (res_id,))
-    conn.commit()
-    conn.close()
-
-def confirm_reservation_user(res_id, user_email):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT confirmed_list FROM reservations WHERE id=?", (res_id,))
-    row = c.fetchone()
-    if row:
-        current_list = row[0].split(',') if row[0] else []
-        if user_email not in current_list:
-            current_list.append(user_email)
-            new_str = ",".join(current_list)
-            c.execute("UPDATE reservations SET confirmed_list=? WHERE id=?", (new_str, res_id))
-    conn.commit()
-    conn.close()
-
-def verifier_quota_hebdo(email, date_obj):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    start_week = date_obj - datetime.timedelta(days=date_obj.weekday())
-    end_week = start_week + datetime.timedelta(days=6)
-    c.execute("SELECT user_email, participants FROM reservations WHERE date_str >= ? AND date_str <= ?", 
-              (start_week.strftime("%Y-%m-%d"), end_week.strftime("%Y-%m-%d")))
-    rows = c.fetchall()
-    count = 0
-    for r in rows:
-        if r[0] == email or (r[1] and email in r[1]): count += 1
-    conn.close()
-    return count < MAX_QUOTA_HEBDO, count
-
-def get_restriction(salle, date_obj, hour):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    date_s = date_obj.strftime("%Y-%m-%d")
-    c.execute("SELECT type FROM restrictions WHERE salle=? AND date_str=? AND hour=-1", (salle, date_s))
-    res_day = c.fetchone()
-    if res_day: 
-        conn.close()
-        return res_day[0]
-    c.execute("SELECT type FROM restrictions WHERE salle=? AND date_str=? AND hour=?", (salle, date_s, hour))
-    res_hour = c.fetchone()
-    conn.close()
-    return res_hour[0] if res_hour else None
-
-def set_restriction(salle, date_obj, hour, type_rest):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    date_s = date_obj.strftime("%Y-%m-%d")
-    if type_rest == "DAY_BLOCK":
-        c.execute("DELETE FROM restrictions WHERE salle=? AND date_str=?", (salle, date_s))
-        c.execute("INSERT INTO restrictions VALUES (?, ?, ?, ?)", (salle, date_s, -1, "DAY_BLOCK"))
-        c.execute("DELETE FROM reservations WHERE salle=? AND date_str=?", (salle, date_s))
-    elif type_rest == "NONE":
-        c.execute("DELETE FROM restrictions WHERE salle=? AND date_str=? AND (hour=? OR hour=-1)", (salle, date_s, hour))
-    else:
-        c.execute("DELETE FROM restrictions WHERE salle=? AND date_str=? AND hour=?", (salle, date_s, hour))
-        c.execute("INSERT INTO restrictions VALUES (?, ?, ?, ?)", (salle, date_s, hour, type_rest))
-        if type_rest == "BLOCK":
-            h_str = f"{hour:02d}:00"
-            c.execute("DELETE FROM reservations WHERE salle=? AND date_str=? AND start_time=?", (salle, date_s, h_str))
-    conn.commit()
-    conn.close()
-
-def admin_mass_lock_etage(date_obj, hour, salles_list, type_rest="BLOCK"):
-    for s in salles_list: set_restriction(s, date_obj, hour, type_rest)
-
-def get_stats_admin():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    c.execute("SELECT COUNT(*) FROM reservations WHERE date_str=?", (today,))
-    total = c.fetchone()[0]
-    c.execute("SELECT salle FROM reservations WHERE date_str=?", (today,))
-    rows = c.fetchall()
-    etages = {"P1": 0, "P2": 0, "P3": 0, "P4": 0}
-    for r in rows:
-        if "P1" in r[0]: etages["P1"] += 1
-        elif "P2" in r[0]: etages["P2"] += 1
-        elif "P3" in r[0]: etages["P3"] += 1
-        elif "P4" in r[0]: etages["P4"] += 1
-    c.execute("SELECT start_time FROM reservations WHERE date_str=?", (today,))
-    time_rows = c.fetchall()
-    heures = {f"{h}h": 0 for h in range(8, 21)}
-    for tr in time_rows:
-        try:
-            h_int = int(tr[0].split(':')[0])
-            key = f"{h_int}h"
-            if key in heures: heures[key] += 1
-        except: pass
-    conn.close()
-    return total, etages, heures
-
-def manage_group_action(email, salle, date_obj, heure_debut, action_type):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    date_s = date_obj.strftime("%Y-%m-%d")
-    h_str = heure_debut.strftime("%H:%M")
-    
-    c.execute("SELECT id, user_email, participants FROM reservations WHERE salle=? AND date_str=? AND start_time <= ? AND end_time > ?", 
-              (salle, date_s, h_str, h_str))
-    existing = c.fetchone()
-    
-    status, msg = "ok", ""
-    
-    if existing:
-        res_id, creator, parts_str = existing
-        participants = parts_str.split(",") if parts_str else []
-        
-        if action_type == "leave":
-            if creator == email:
-                if participants:
-                    new_boss = participants.pop(0)
-                    new_parts_str = ",".join(participants)
-                    c.execute("UPDATE reservations SET user_email=?, participants=? WHERE id=?", (new_boss, new_parts_str, res_id))
-                    msg = f"Vous avez quitté. {new_boss} est responsable."
-                else:
-                    c.execute("DELETE FROM reservations WHERE id=?", (res_id,))
-                    msg = "Réservation annulée (Groupe vide)."
-            elif email in participants:
-                participants.remove(email)
-                c.execute("UPDATE reservations SET participants=? WHERE id=?", (",".join(participants), res_id))
-                msg = "Vous avez quitté le groupe."
-        
-        elif action_type == "cancel":
-             c.execute("DELETE FROM reservations WHERE id=?", (res_id,))
-             msg = "Réservation annulée."
-
-        elif action_type == "join":
-            ok_q, _ = verifier_quota_hebdo(email, date_obj)
-            if not ok_q:
-                status, msg = "error", "Quota hebdo dépassé !"
-            else:
-                if email not in participants and email != creator:
-                    participants.append(email)
-                    c.execute("UPDATE reservations SET participants=? WHERE id=?", (",".join(participants), res_id))
-                    msg = f"Groupe rejoint ({1+len(participants)}/{MIN_GROUPE})."
-                else:
-                    msg = "Vous êtes déjà dans le groupe."
-    else:
-        status, msg = "error", "Réservation introuvable."
-                
-    conn.commit()
-    conn.close()
-    return status, msg
-
-def manage_clic_salle(email, salle, date_obj, heure_debut, heure_fin, is_forced_groupe):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    date_s = date_obj.strftime("%Y-%m-%d")
-    h_str = heure_debut.strftime("%H:%M")
-    
-    rest = get_restriction(salle, date_obj, heure_debut.hour)
-    if rest == "BLOCK" or rest == "DAY_BLOCK":
-        conn.close()
-        return "error", "⛔ Salle bloquée par l'admin."
-    
-    c.execute("INSERT INTO reservations (user_email, salle, date_str, start_time, end_time, participants, confirmed_list) VALUES (?, ?, ?, ?, ?, ?, '')",
-              (email, salle, date_s, h_str, heure_fin.strftime("%H:%M"), ""))
-    
-    msg = "Groupe initié (1/5) !" if is_forced_groupe else "Salle réservée (Solo)."
-    conn.commit()
-    conn.close()
-    return "ok", msg
-
-def get_db_reservations(date_obj):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT salle, start_time, end_time, user_email, participants FROM reservations WHERE date_str=?", (date_obj.strftime("%Y-%m-%d"),))
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def get_mes_reservations_futures(email):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    today = datetime.date.today().strftime("%Y-%m-%d")
-    c.execute("SELECT salle, date_str, start_time, end_time, confirmed_list, id, participants, user_email FROM reservations WHERE (user_email=? OR participants LIKE ?) AND date_str >= ? ORDER BY date_str ASC", (email, f"%{email}%", today))
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def charger_liens():
-    if not os.path.exists(FICHIER_LIENS): return []
-    with open(FICHIER_LIENS, "r", encoding="utf-8") as f:
-        return [line.strip() for line in f if line.strip().startswith("http")]
-
-def nettoyer_nom_salle(nom_brut):
-    if "(" in nom_brut: return nom_brut.split("(")[0].strip()
-    return nom_brut
-
-def update_cache_ade_si_necessaire():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT value FROM metadata WHERE key='last_update'")
-    res = c.fetchone()
-    now_ts = time.time()
-    clean_no_show_reservations()
-    if not res or (now_ts - float(res[0]) > CACHE_TIMEOUT):
-        c.execute("DELETE FROM cache_ade")
-        liens = charger_liens()
-        for url in liens:
-            try:
-                r = requests.get(url, timeout=5)
-                if r.status_code == 200:
-                    cours_liste = r.text.split("BEGIN:VEVENT")
-                    for cours in cours_liste:
-                        if "END:VEVENT" not in cours: continue
-                        debut, fin, lieu = None, None, ""
-                        for ligne in cours.split('\n'):
-                            l = ligne.strip()
-                            if l.startswith("DTSTART:"):
-                                try: debut = datetime.datetime.strptime(l.replace("DTSTART:","").replace("Z","").strip(), '%Y%m%dT%H%M%S')
-                                except: pass
-                            elif l.startswith("DTEND:"):
-                                try: fin = datetime.datetime.strptime(l.replace("DTEND:","").replace("Z","").strip(), '%Y%m%dT%H%M%S')
-                                except: pass
-                            elif l.startswith("LOCATION:"):
-                                lieu = l.replace("LOCATION:", "").replace("\\", "")
-                        if lieu and debut and fin:
-                            parts = lieu.split(',')
-                            for s in parts:
-                                s = s.strip()
-                                if "CC P" in s:
-                                    c.execute("INSERT INTO cache_ade VALUES (?, ?, ?)", (nettoyer_nom_salle(s), debut.isoformat(), fin.isoformat()))
-            except: pass
-        c.execute("REPLACE INTO metadata VALUES ('last_update', ?)", (str(now_ts),))
-        conn.commit()
-    conn.close()
-
-def get_planning_sql(date_choisie):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    d_start = datetime.datetime.combine(date_choisie, datetime.time(0,0))
-    d_end = datetime.datetime.combine(date_choisie, datetime.time(23,59))
-    c.execute("SELECT salle, debut, fin FROM cache_ade WHERE debut >= ? AND debut <= ?", (d_start.isoformat(), d_end.isoformat()))
-    rows = c.fetchall()
-    conn.close()
-    planning = []
-    for r in rows:
-        try: d = datetime.datetime.fromisoformat(r[1])
-        except: d = datetime.datetime.now()
-        try: f = datetime.datetime.fromisoformat(r[2])
-        except: f = datetime.datetime.now()
-        planning.append({"salle": r[0], "debut": d, "fin": f})
-    return planning
-
-def analyse_salle_intelligente(salle, planning_jour, resas_db, time_choisi, my_email, date_obj):
-    restriction = get_restriction(salle, date_obj, time_choisi.hour)
-    if restriction == "DAY_BLOCK": return "admin_lock", datetime.time(20,0), "⛔ Fermée (Journée)", False
-    if restriction == "BLOCK": return "admin_lock", datetime.time(20,0), "⛔ Fermée (Créneau)", False
-    cours_now = [c for c in planning_jour if c['salle'] == salle and c['debut'].time() <= time_choisi < c['fin'].time()]
-    if cours_now: return "rouge", cours_now[0]['fin'].time(), "Cours", False
-    for r in resas_db:
-        r_start = datetime.datetime.strptime(r[1], "%H:%M").time()
-        r_end = datetime.datetime.strptime(r[2], "%H:%M").time()
-        if r[0] == salle and r_start <= time_choisi < r_end:
-            creator = r[3]
-            parts = r[4].split(",") if r[4] else []
-            nb_pers = 1 + len(parts)
-            if creator == my_email:
-                return "orange_moi", r_end, "Annuler", False
-            elif my_email in parts:
-                return "orange_moi", r_end, f"Quitter ({nb_pers}/{MIN_GROUPE})", False
-            if nb_pers < MIN_GROUPE: return "bleu", r_end, f"Rejoindre ({nb_pers}/{MIN_GROUPE})", True
-            return "orange", r_end, "Complet", False
-    is_group_forced = (restriction == "GROUP")
-    prochains = [c for c in planning_jour if c['salle'] == salle and c['debut'].time() > time_choisi]
-    prochains.sort(key=lambda x: x['debut'])
-    limit = prochains[0]['debut'].time() if prochains else datetime.time(20, 0)
-    return "vert", limit, "Libre", is_group_forced
-
 # --- DIALOGS ---
 @st.dialog("📝 Détails de la Réservation")
 def confirm_booking_dialog(email, salle, date_obj, time_start, time_end, mode_groupe):
@@ -659,9 +218,10 @@ def show_ticket(res_data):
 
 # --- VUES ---
 def main():
+    reset_compteurs_db()
     if not st.session_state.logged_in:
         inject_custom_css("detail")
-        vue_login()
+        with chrono("page", "login"): vue_login()
     else:
         with st.sidebar:
             st.title("🎓 UPEC Companion")
@@ -672,27 +232,40 @@ def main():
                 st.session_state.logged_in = False
                 st.rerun()
         
-        if menu == "📅 Mon Planning":
-            inject_custom_css("detail")
-            vue_planning()
-        elif menu == "👤 Mon Profil":
-            inject_custom_css("detail")
-            vue_profil()
-        else:
-            if st.session_state.is_admin:
-                if st.session_state.page == "accueil":
-                    inject_custom_css("accueil")
-                    vue_accueil_admin()
-                elif st.session_state.page == "detail_etage":
-                    inject_custom_css("detail")
-                    vue_detail_etage_admin()
+        if menu == "📅 Mon Planning": nom_page = "planning"
+        elif menu == "👤 Mon Profil": nom_page = "profil"
+        else: nom_page = ("admin/" if st.session_state.is_admin else "") + st.session_state.page
+        with chrono("page", nom_page):
+            if menu == "📅 Mon Planning":
+                inject_custom_css("detail")
+                vue_planning()
+            elif menu == "👤 Mon Profil":
+                inject_custom_css("detail")
+                vue_profil()
             else:
-                if st.session_state.page == "accueil":
-                    inject_custom_css("accueil")
-                    vue_accueil()
-                elif st.session_state.page == "detail_etage":
-                    inject_custom_css("detail")
-                    vue_detail_etage()
+                if st.session_state.is_admin:
+                    if st.session_state.page == "accueil":
+                        inject_custom_css("accueil")
+                        vue_accueil_admin()
+                    elif st.session_state.page == "detail_etage":
+                        inject_custom_css("detail")
+                        vue_detail_etage_admin()
+                else:
+                    if st.session_state.page == "accueil":
+                        inject_custom_css("accueil")
+                        vue_accueil()
+                    elif st.session_state.page == "detail_etage":
+                        inject_custom_css("detail")
+                        vue_detail_etage()
+                    elif st.session_state.page == "recherche":
+                        inject_custom_css("detail")
+                        vue_recherche()
+                    elif st.session_state.page == "semaine":
+                        inject_custom_css("detail")
+                        vue_semaine()
+        if st.session_state.is_admin:
+            nb_req, nb_conn = get_compteurs_db()
+            st.sidebar.caption(f"🗄️ {nb_req} requêtes SQL · {nb_conn} connexion(s) ouverte(s)")
 
 def vue_profil():
     st.title("👤 Mon Profil")
@@ -709,37 +282,34 @@ def vue_planning():
     if not st.session_state.ade_url:
         st.warning("⚠️ Configurez vos liens ADE dans 'Mon Profil'.")
         return
-    events = get_mon_planning(st.session_state.ade_url)
-    if not events:
-        st.info("Aucun cours trouvé.")
-    else:
-        today = datetime.date.today()
-        col_today, col_tom = st.columns(2)
-        with col_today:
-            st.subheader("Aujourd'hui")
-            events_today = [e for e in events if e['debut'].date() == today]
-            if not events_today: st.caption("Rien de prévu.")
-            for e in events_today:
-                st.markdown(f"""
-                <div class="cours-card">
-                    <b>{e['debut'].strftime('%H:%M')} - {e['fin'].strftime('%H:%M')}</b><br>
-                    {e['titre']}<br>
-                    <small>📍 {e['lieu']}</small>
-                </div>
-                """, unsafe_allow_html=True)
-        with col_tom:
-            st.subheader("Demain")
-            tom = today + datetime.timedelta(days=1)
-            events_tom = [e for e in events if e['debut'].date() == tom]
-            if not events_tom: st.caption("Rien de prévu.")
-            for e in events_tom:
-                st.markdown(f"""
-                <div class="cours-card" style="border-left-color: #444;">
-                    <b>{e['debut'].strftime('%H:%M')} - {e['fin'].strftime('%H:%M')}</b><br>
-                    {e['titre']}<br>
-                    <small>📍 {e['lieu']}</small>
-                </div>
-                """, unsafe_allow_html=True)
+    today = datetime.date.today()
+    events = get_mon_planning(st.session_state.ade_url, today, today + datetime.timedelta(days=2))
+    col_today, col_tom = st.columns(2)
+    with col_today:
+        st.subheader("Aujourd'hui")
+        events_today = [e for e in events if e['debut'].date() == today]
+        if not events_today: st.caption("Rien de prévu.")
+        for e in events_today:
+            st.markdown(f"""
+            <div class="cours-card">
+                <b>{e['debut'].strftime('%H:%M')} - {e['fin'].strftime('%H:%M')}</b><br>
+                {e['titre']}<br>
+                <small>📍 {e['lieu']}</small>
+            </div>
+            """, unsafe_allow_html=True)
+    with col_tom:
+        st.subheader("Demain")
+        tom = today + datetime.timedelta(days=1)
+        events_tom = [e for e in events if e['debut'].date() == tom]
+        if not events_tom: st.caption("Rien de prévu.")
+        for e in events_tom:
+            st.markdown(f"""
+            <div class="cours-card" style="border-left-color: #444;">
+                <b>{e['debut'].strftime('%H:%M')} - {e['fin'].strftime('%H:%M')}</b><br>
+                {e['titre']}<br>
+                <small>📍 {e['lieu']}</small>
+            </div>
+            """, unsafe_allow_html=True)
 
 def vue_login():
     col_main, _ = st.columns([1, 1])
@@ -768,7 +338,7 @@ def vue_login():
 
 def vue_accueil_admin():
     st.title("🛠️ Admin Dashboard")
-    tab_pilotage, tab_stats = st.tabs(["🛠️ Pilotage Salles", "📊 Statistiques"])
+    tab_pilotage, tab_stats, tab_perf = st.tabs(["🛠️ Pilotage Salles", "📊 Statistiques", "⏱️ Performances"])
     with tab_pilotage:
         st.info("ℹ️ Sélectionnez un étage pour gérer les blocages.")
         current_mode = get_admin_config_groupe()
@@ -798,6 +368,37 @@ def vue_accueil_admin():
         with c_chart2:
             st.write("#### 🕒 Pic Horaire")
             st.bar_chart(data_heures)
+        st.write("---")
+        st.write("### 🗓️ Historique")
+        periode = st.selectbox("Période", ["4 dernières semaines", "3 derniers mois"], label_visibility="collapsed")
+        fin = datetime.date.today() - datetime.timedelta(days=1)
+        debut = fin - datetime.timedelta(days=27 if periode.startswith("4") else 90)
+        histo = get_historique_occupation(debut, fin)
+        kpi3.metric("No-shows (période)", histo["no_shows"])
+        st.write("#### 📅 Réservations par jour")
+        st.bar_chart(histo["par_jour"])
+        c_chart3, c_chart4 = st.columns(2)
+        with c_chart3:
+            st.write("#### 🏢 Par Étage")
+            st.bar_chart(histo["par_etage"])
+        with c_chart4:
+            st.write("#### 🕒 Par Heure")
+            st.bar_chart(histo["par_heure"])
+    with tab_perf:
+        st.caption("Mesures du process depuis son démarrage (percentiles sur les derniers appels).")
+        c1, c2, c3 = st.columns([2, 1, 1])
+        categorie = c1.selectbox("Catégorie", ["page", "fragment", "fonction", "sql", "http", "tache"])
+        c2.download_button("📥 Export JSON", exporter_mesures(), file_name="mesures_radar.json", mime="application/json", use_container_width=True)
+        if c3.button("🧹 Remettre à zéro", use_container_width=True): reset_mesures(); st.rerun()
+        mesures = get_mesures(categorie)
+        if mesures: st.dataframe([{k: v for k, v in m.items() if k != "categorie"} for m in mesures], use_container_width=True, hide_index=True)
+        else: st.caption("Aucune mesure.")
+        st.write("#### 🐢 Requêtes lentes")
+        seuil = st.number_input("Seuil (ms)", min_value=1.0, value=float(SEUIL_REQUETE_LENTE_MS), step=10.0)
+        if seuil != SEUIL_REQUETE_LENTE_MS: set_seuil_requete_lente(seuil)
+        lentes = get_requetes_lentes()
+        if lentes: st.dataframe([dict(l, ts=datetime.datetime.fromtimestamp(l["ts"]).strftime("%H:%M:%S")) for l in lentes], use_container_width=True, hide_index=True)
+        else: st.caption("Aucune requête au-dessus du seuil.")
 
 def vue_detail_etage_admin():
     if st.button("⬅️ Retour Dashboard"): st.session_state.page="accueil"; st.rerun()
@@ -828,67 +429,54 @@ def vue_detail_etage_admin():
             h = c_h.slider("Heure cible (Créneau d'action)", 8, 20, def_h, format="%dh", label_visibility="collapsed")
             st.write(""); st.write("") 
         date_choisie = jours_map[choix_jour]
-        time_choisi = datetime.time(h, 0)
-        planning_jour = get_planning_sql(date_choisie)
-        resas_db = get_db_reservations(date_choisie)
-        salles_etage = sorted(list(set([c['salle'] for c in planning_jour if f"CC {etage}" in c['salle']])))
-        groupes = {"Niveau Parking": [], "Niveau 0": [], "Niveau 1": []}
-        for s in salles_etage:
-            suffixe = s.replace(f"CC {etage} ", "")
-            if "P" in suffixe: groupes["Niveau Parking"].append(s)
-            elif suffixe.startswith("1"): groupes["Niveau 1"].append(s)
-            else: groupes["Niveau 0"].append(s)
+        groupes = get_salles_etage(etage)
+        salles_etage = [s for lst in groupes.values() for s in lst]
         
         with st.expander("🎛️ Commandes Générales (Tous Niveaux)", expanded=True):
-            st.write(f"Actions pour : **{etage}** le **{date_choisie}** à **{h}h**")
+            h_debut, h_fin = st.slider("Plage horaire", 8, 20, (h, h), format="%dh")
+            heures = range(h_debut, h_fin + 1)
+            plage = f"{h_debut}h" if h_debut == h_fin else f"{h_debut}h-{h_fin}h"
+            st.write(f"Actions pour : **{etage}** le **{date_choisie}** de **{plage}**")
             c1, c2, c3 = st.columns([2, 1, 1])
             c1.write(f"🏢 **TOUT {etage}**")
             if c2.button("🔒 BLOQUER TOUT", type="primary"):
-                admin_mass_lock_etage(date_choisie, h, salles_etage, "BLOCK")
-                st.toast(f"Tout {etage} bloqué !"); time.sleep(0.5); st.rerun()
+                r = appliquer_restrictions(salles_etage, date_choisie, heures, "BLOCK")
+                st.toast(f"Tout {etage} bloqué ! ({r['restrictions_posees']} créneaux, {r['reservations_supprimees']} résa. annulées, {r['duree_ms']} ms)"); time.sleep(0.5); st.rerun()
             if c3.button("🔓 OUVRIR TOUT"):
-                admin_mass_lock_etage(date_choisie, h, salles_etage, "NONE")
-                st.toast(f"Tout {etage} ouvert !"); time.sleep(0.5); st.rerun()
+                r = appliquer_restrictions(salles_etage, date_choisie, heures, "NONE")
+                st.toast(f"Tout {etage} ouvert ! ({r['restrictions_levees']} levées, {r['duree_ms']} ms)"); time.sleep(0.5); st.rerun()
             st.divider()
             for nom_grp, lst in groupes.items():
                 if not lst: continue
                 c1, c2, c3 = st.columns([2, 1, 1])
                 c1.write(f"🔹 **{nom_grp}**")
                 if c2.button(f"🔒 Bloquer", key=f"lock_{nom_grp}"):
-                    admin_mass_lock_etage(date_choisie, h, lst, "BLOCK")
-                    st.toast(f"{nom_grp} bloqué !"); time.sleep(0.5); st.rerun()
+                    r = appliquer_restrictions(lst, date_choisie, heures, "BLOCK")
+                    st.toast(f"{nom_grp} bloqué ! ({r['restrictions_posees']} créneaux, {r['reservations_supprimees']} résa. annulées)"); time.sleep(0.5); st.rerun()
                 if c3.button(f"🔓 Ouvrir", key=f"unlock_{nom_grp}"):
-                    admin_mass_lock_etage(date_choisie, h, lst, "NONE")
-                    st.toast(f"{nom_grp} ouvert !"); time.sleep(0.5); st.rerun()
+                    r = appliquer_restrictions(lst, date_choisie, heures, "NONE")
+                    st.toast(f"{nom_grp} ouvert ! ({r['restrictions_levees']} levées)"); time.sleep(0.5); st.rerun()
         st.write("---")
         st.write("#### Gestion par Salle")
-        for nom_grp, lst in groupes.items():
-            if not lst: continue
-            is_open = (st.session_state.expanded_grp == nom_grp)
-            with st.expander(f"Détail {nom_grp}", expanded=is_open):
-                cols_salles = st.columns(2)
-                for i, s in enumerate(lst):
-                    nom_court = s.replace(f"CC {etage} ", "")
-                    rest = get_restriction(s, date_choisie, h)
-                    has_pc = has_equipment(s, "💻")
-                    has_plug = has_equipment(s, "🔌")
-                    has_pmr = has_equipment(s, "♿")
-                    with cols_salles[i % 2]:
-                        st.write(f"**{nom_court}**")
-                        c_eq1, c_eq2, c_eq3 = st.columns(3)
-                        if c_eq1.button("💻", key=f"pc_{s}", type="primary" if has_pc else "secondary", help="PC"): toggle_equipment(s, "💻"); st.rerun()
-                        if c_eq2.button("🔌", key=f"pl_{s}", type="primary" if has_plug else "secondary", help="Prise"): toggle_equipment(s, "🔌"); st.rerun()
-                        if c_eq3.button("♿", key=f"pm_{s}", type="primary" if has_pmr else "secondary", help="PMR"): toggle_equipment(s, "♿"); st.rerun()
-                        st.caption("Contrôle d'accès :")
-                        c1, c2, c3 = st.columns(3)
-                        if c1.button("⛔", key=f"b_{s}", help="Bloquer 1h"): set_restriction(s, date_choisie, h, "NONE" if rest=="BLOCK" else "BLOCK"); st.rerun()
-                        if c2.button("👥", key=f"g_{s}", help="Force Groupe"): set_restriction(s, date_choisie, h, "NONE" if rest=="GROUP" else "GROUP"); st.rerun()
-                        if c3.button("⚫", key=f"d_{s}", help="Bloquer Jour"): set_restriction(s, date_choisie, h, "NONE" if rest=="DAY_BLOCK" else "DAY_BLOCK"); st.rerun()
-                        st.write("---")
+        controles_salles_admin(etage, date_choisie, h)
+        veille_changements(date_choisie)
+        st.write("---")
+        with st.expander("🗂️ Registre des salles"):
+            c_nom, c_add = st.columns([3, 1])
+            nouvelle = c_nom.text_input("Ajouter une salle", placeholder=f"CC {etage} 105", label_visibility="collapsed")
+            if c_add.button("➕ Ajouter", use_container_width=True):
+                if classer_salle(nouvelle)[1] is None: st.warning(f"Nom attendu : CC {etage} 105")
+                elif ajouter_salle(nouvelle): st.toast(f"{nouvelle} ajoutée !"); time.sleep(0.5); st.rerun()
+                else: st.warning("Salle déjà dans le registre.")
+            for nom, batiment, et, niveau, actif in get_registre_salles(etage):
+                c_n, c_niv, c_act = st.columns([2, 2, 1])
+                c_n.write(nom)
+                new_niv = c_niv.selectbox("Niveau", NIVEAUX, index=NIVEAUX.index(niveau) if niveau in NIVEAUX else 1, key=f"niv_{nom}", label_visibility="collapsed")
+                new_act = c_act.checkbox("Visible", value=bool(actif), key=f"act_{nom}")
+                if new_niv != niveau or new_act != bool(actif): maj_salle(nom, et, new_niv, new_act); st.rerun()
 
 def vue_accueil():
     st.title("🏢 Radar Salles")
-    update_cache_ade_si_necessaire()
     ok, nb = verifier_quota_hebdo(st.session_state.email, datetime.date.today())
     st.progress(nb/MAX_QUOTA_HEBDO, text=f"Quota Hebdo : {nb}/{MAX_QUOTA_HEBDO}")
     st.write("#### Choisir un étage")
@@ -899,8 +487,86 @@ def vue_accueil():
     with c2:
         if st.button("P2", use_container_width=True): st.session_state.etage_choisi="P2"; st.session_state.page="detail_etage"; st.rerun()
         if st.button("P4", use_container_width=True): st.session_state.etage_choisi="P4"; st.session_state.page="detail_etage"; st.rerun()
+    if st.button("🔎 Chercher sur tout le campus", use_container_width=True): st.session_state.page="recherche"; st.rerun()
+    if st.button("🗓️ Vue semaine", use_container_width=True): st.session_state.page="semaine"; st.rerun()
     st.markdown("---")
     st.write("#### Vos réservations")
+    liste_mes_reservations()
+
+# --- FRAGMENTS ---
+# Parties de page rejouées seules : un clic dedans ne relance ni le CSS, ni la sidebar,
+# ni les sélecteurs de date/heure ; les données viennent des caches du backend.
+def rerun_fragment():
+    # un clic fusionné par Streamlit avec un rerun complet n'est plus dans un rerun de fragment
+    try: st.rerun(scope="fragment")
+    except st.errors.StreamlitAPIException: st.rerun()
+
+# Toutes les VEILLE_TICK secondes, un entier lu en base : la page n'est relancée que si une
+# écriture (réservation d'un autre, blocage admin, no-show, refresh ADE) a touché le jour affiché.
+VEILLE_TICK = 15
+
+def noter_version_vue(date_choisie):
+    # avant de lire le snapshot : une écriture entre les deux provoque au pire un rerun de trop
+    st.session_state[f"version_{date_choisie}"] = get_version_jour(date_choisie)
+
+@st.fragment(run_every=VEILLE_TICK)
+def veille_changements(date_choisie):
+    if get_version_jour(date_choisie) > st.session_state.get(f"version_{date_choisie}", 0): st.rerun()
+
+@st.fragment
+@mesurer("fragment")
+def grille_etage(etage, date_choisie, time_choisi, is_forced_groupe, reservation_possible):
+    noter_version_vue(date_choisie)
+    index_jour = get_index_jour(date_choisie)
+    groupes = get_salles_etage(etage)
+    salles_etage = [s for lst in groupes.values() for s in lst]
+    equip = get_equipements_salles(salles_etage)
+    for nom_grp, lst in groupes.items():
+        if not lst: continue
+        etats = analyser_salles(index_jour, lst, time_choisi, st.session_state.email)
+        dispos = []
+        for s in lst:
+            color, fin, msg, force_local = etats[s]
+            dispos.append({"s": s, "c": color, "f": fin, "m": msg, "g": force_local})
+        nb_libres = len([d for d in dispos if d['c'] == 'vert'])
+        icone = "🟢" if nb_libres > 0 else "🔴"
+        is_open = (st.session_state.expanded_grp == nom_grp)
+        with st.expander(f"{nom_grp} — {icone} {nb_libres} disponibles", expanded=is_open):
+            cols_salles = st.columns(2)
+            for i, d in enumerate(dispos):
+                nom_court = d['s'].replace(f"CC {etage} ", "")
+                icons_str = format_icones(equip[d['s']])
+                with cols_salles[i % 2]:
+                    if d['c'] == 'vert':
+                        must_group = d['g'] or is_forced_groupe
+                        btn_txt = f"👥 Créer Grp {nom_court}{icons_str}" if must_group else f"👤 {nom_court}{icons_str}"
+                        if st.button(btn_txt, key=d['s'], use_container_width=True, disabled=not reservation_possible):
+                            dt_debut = datetime.datetime.combine(date_choisie, time_choisi)
+                            dt_fin_th = dt_debut + datetime.timedelta(hours=MAX_DUREE_HEURES)
+                            dt_fin_cr = datetime.datetime.combine(date_choisie, d['f'])
+                            fin_eff = min(dt_fin_th, dt_fin_cr).time()
+                            st.session_state.expanded_grp = nom_grp
+                            confirm_booking_dialog(st.session_state.email, d['s'], date_choisie, time_choisi, fin_eff, d['g'] or is_forced_groupe)
+                    elif d['c'] == 'bleu':
+                        if st.button(f"🔵 {d['m']}{icons_str}", key=d['s'], use_container_width=True, disabled=not reservation_possible):
+                            stat, msg = manage_group_action(st.session_state.email, d['s'], date_choisie, time_choisi, "join")
+                            st.session_state.expanded_grp = nom_grp
+                            if stat == "error": st.error(msg)
+                            elif msg: st.toast(msg)
+                            rerun_fragment()
+                    elif d['c'] == 'orange_moi':
+                        if st.button(f"🟠 {d['m']}{icons_str}", key=d['s'], use_container_width=True, disabled=not reservation_possible):
+                            action = "cancel" if "Annuler" in d['m'] else "leave"
+                            stat, msg = manage_group_action(st.session_state.email, d['s'], date_choisie, time_choisi, action)
+                            st.session_state.expanded_grp = nom_grp
+                            if msg: st.toast(msg)
+                            rerun_fragment()
+                    elif d['c'] == 'admin_lock': st.error(f"{d['m']} {nom_court}")
+                    else: st.warning(f"🔒 {nom_court} ({d['m']})")
+
+@st.fragment
+@mesurer("fragment")
+def liste_mes_reservations():
     mes_resas = get_mes_reservations_futures(st.session_state.email)
     if not mes_resas: st.caption("Aucune.")
     else:
@@ -933,10 +599,42 @@ def vue_accueil():
                     elif can_checkin:
                         if st.button("📍 Scanner", key=f"chk_{r[5]}", type="primary"):
                             confirm_reservation_user(r[5], st.session_state.email)
-                            st.toast("Présence confirmée !"); st.rerun()
+                            st.toast("Présence confirmée !"); rerun_fragment()
                     else: st.button("Attente...", disabled=True, key=f"wait_{r[5]}")
                 st.divider()
 
+@st.fragment
+@mesurer("fragment")
+def controles_salles_admin(etage, date_choisie, h):
+    noter_version_vue(date_choisie)
+    index_jour = get_index_jour(date_choisie)
+    groupes = get_salles_etage(etage)
+    salles_etage = [s for lst in groupes.values() for s in lst]
+    equip = get_equipements_salles(salles_etage)
+    for nom_grp, lst in groupes.items():
+        if not lst: continue
+        is_open = (st.session_state.expanded_grp == nom_grp)
+        with st.expander(f"Détail {nom_grp}", expanded=is_open):
+            cols_salles = st.columns(2)
+            for i, s in enumerate(lst):
+                nom_court = s.replace(f"CC {etage} ", "")
+                rest = restriction_index(index_jour, s, h)
+                has_pc = "💻" in equip[s]
+                has_plug = "🔌" in equip[s]
+                has_pmr = "♿" in equip[s]
+                with cols_salles[i % 2]:
+                    st.write(f"**{nom_court}**")
+                    c_eq1, c_eq2, c_eq3 = st.columns(3)
+                    if c_eq1.button("💻", key=f"pc_{s}", type="primary" if has_pc else "secondary", help="PC"): toggle_equipment(s, "💻"); rerun_fragment()
+                    if c_eq2.button("🔌", key=f"pl_{s}", type="primary" if has_plug else "secondary", help="Prise"): toggle_equipment(s, "🔌"); rerun_fragment()
+                    if c_eq3.button("♿", key=f"pm_{s}", type="primary" if has_pmr else "secondary", help="PMR"): toggle_equipment(s, "♿"); rerun_fragment()
+                    st.caption("Contrôle d'accès :")
+                    c1, c2, c3 = st.columns(3)
+                    if c1.button("⛔", key=f"b_{s}", help="Bloquer 1h"): set_restriction(s, date_choisie, h, "NONE" if rest=="BLOCK" else "BLOCK"); rerun_fragment()
+                    if c2.button("👥", key=f"g_{s}", help="Force Groupe"): set_restriction(s, date_choisie, h, "NONE" if rest=="GROUP" else "GROUP"); rerun_fragment()
+                    if c3.button("⚫", key=f"d_{s}", help="Bloquer Jour"): set_restriction(s, date_choisie, h, "NONE" if rest=="DAY_BLOCK" else "DAY_BLOCK"); rerun_fragment()
+                    st.write("---")
+
 def vue_detail_etage():
     if st.button("⬅️ Retour"): st.session_state.page="accueil"; st.rerun()
     st.write("") 
@@ -971,58 +669,75 @@ def vue_detail_etage():
         date_choisie = jours_map[choix_jour]
         time_choisi = datetime.time(h, 0)
         reservation_possible = (date_choisie == datetime.date.today())
-        planning_jour = get_planning_sql(date_choisie)
-        resas_db = get_db_reservations(date_choisie)
-        salles_etage = sorted(list(set([c['salle'] for c in planning_jour if f"CC {etage}" in c['salle']])))
-        groupes = {"Niveau Parking": [], "Niveau 0": [], "Niveau 1": []}
-        for s in salles_etage:
-            suffixe = s.replace(f"CC {etage} ", "")
-            if "P" in suffixe: groupes["Niveau Parking"].append(s)
-            elif suffixe.startswith("1"): groupes["Niveau 1"].append(s)
-            else: groupes["Niveau 0"].append(s)
-        for nom_grp, lst in groupes.items():
-            if not lst: continue
-            dispos = []
-            for s in lst:
-                color, fin, msg, force_local = analyse_salle_intelligente(s, planning_jour, resas_db, time_choisi, st.session_state.email, date_choisie)
-                dispos.append({"s": s, "c": color, "f": fin, "m": msg, "g": force_local})
-            nb_libres = len([d for d in dispos if d['c'] == 'vert'])
-            icone = "🟢" if nb_libres > 0 else "🔴"
-            is_open = (st.session_state.expanded_grp == nom_grp)
-            with st.expander(f"{nom_grp} — {icone} {nb_libres} disponibles", expanded=is_open):
-                cols_salles = st.columns(2)
-                for i, d in enumerate(dispos):
-                    nom_court = d['s'].replace(f"CC {etage} ", "")
-                    icons_str = get_room_icons(d['s'])
-                    with cols_salles[i % 2]:
-                        if d['c'] == 'vert':
-                            must_group = d['g'] or is_forced_groupe
-                            btn_txt = f"👥 Créer Grp {nom_court}{icons_str}" if must_group else f"👤 {nom_court}{icons_str}"
-                            if st.button(btn_txt, key=d['s'], use_container_width=True, disabled=not reservation_possible):
-                                dt_debut = datetime.datetime.combine(date_choisie, time_choisi)
-                                dt_fin_th = dt_debut + datetime.timedelta(hours=MAX_DUREE_HEURES)
-                                dt_fin_cr = datetime.datetime.combine(date_choisie, d['f'])
-                                fin_eff = min(dt_fin_th, dt_fin_cr).time()
-                                st.session_state.expanded_grp = nom_grp
-                                confirm_booking_dialog(st.session_state.email, d['s'], date_choisie, time_choisi, fin_eff, d['g'] or is_forced_groupe)
-                        elif d['c'] == 'bleu':
-                            if st.button(f"🔵 {d['m']}{icons_str}", key=d['s'], use_container_width=True, disabled=not reservation_possible):
-                                stat, msg = manage_group_action(st.session_state.email, d['s'], date_choisie, time_choisi, "join")
-                                st.session_state.expanded_grp = nom_grp
-                                if stat == "error": st.error(msg)
-                                elif msg: st.toast(msg)
-                                st.rerun()
-                        elif d['c'] == 'orange_moi':
-                            if st.button(f"🟠 {d['m']}{icons_str}", key=d['s'], use_container_width=True, disabled=not reservation_possible):
-                                action = "cancel" if "Annuler" in d['m'] else "leave"
-                                stat, msg = manage_group_action(st.session_state.email, d['s'], date_choisie, time_choisi, action)
-                                st.session_state.expanded_grp = nom_grp
-                                if msg: st.toast(msg)
-                                st.rerun()
-                        elif d['c'] == 'admin_lock': st.error(f"{d['m']} {nom_court}")
-                        else: st.warning(f"🔒 {nom_court} ({d['m']})")
+        liberes = [l for l in get_creneaux_liberes(st.session_state.vu_no_show, date_choisie) if f"CC {etage}" in l[1]]
+        if liberes:
+            st.info("🟢 Libérée(s) faute de check-in : " + ", ".join(f"{l[1].replace(f'CC {etage} ', '')} ({l[3]})" for l in liberes))
+            st.session_state.vu_no_show = liberes[-1][0]
+        grille_etage(etage, date_choisie, time_choisi, is_forced_groupe, reservation_possible)
+        veille_changements(date_choisie)
         if not reservation_possible: st.caption("🔒 Réservation ouverte uniquement pour le jour même.")
         else: st.info("👆 Cliquez sur un niveau pour dérouler.")
 
+def vue_recherche():
+    if st.button("⬅️ Retour"): st.session_state.page="accueil"; st.rerun()
+    st.title("🔎 Salle libre sur le campus")
+    today = datetime.date.today()
+    if today.weekday() > 4: today += datetime.timedelta(days=(7-today.weekday()))
+    jours_options, jours_map, curr = [], {}, today
+    for i in range(5):
+        l = format_date_joli(curr); jours_options.append(l); jours_map[l]=curr; curr+=datetime.timedelta(days=1); 
+        while curr.weekday()>4: curr+=datetime.timedelta(days=1)
+    c_d, c_h = st.columns([1, 2])
+    choix_jour = c_d.selectbox("Date", options=jours_options)
+    now_h = datetime.datetime.now().hour
+    def_h = now_h if 8 <= now_h <= 19 else 10
+    h = c_h.slider("À partir de", 8, 19, def_h, format="%dh")
+    c_duree, c_equip = st.columns([1, 2])
+    duree = c_duree.selectbox("Libre pendant au moins", [30, 60, 90, 120], index=1, format_func=lambda m: f"{m // 60}h{m % 60:02d}" if m >= 60 else f"{m} min")
+    equipements = c_equip.multiselect("Équipements", ["💻", "🔌", "♿"])
+    date_choisie = jours_map[choix_jour]
+    time_choisi = datetime.time(h, 0)
+    reservation_possible = (date_choisie == datetime.date.today())
+    is_forced_groupe = get_admin_config_groupe()
+    resultats = rechercher_salles_libres(date_choisie, time_choisi, duree, equipements)
+    if not resultats:
+        st.warning("Aucune salle ne correspond.")
+        return
+    st.caption(f"{len(resultats)} salle(s), la plus longue plage libre en premier.")
+    for r in resultats[:30]:
+        c_info, c_btn = st.columns([3, 1])
+        c_info.markdown(f"**{r['salle']}**{format_icones(r['icones'])}  \n🟢 libre jusqu'à {r['fin'].strftime('%H:%M')} ({r['minutes'] // 60}h{r['minutes'] % 60:02d})")
+        must_group = r['groupe'] or is_forced_groupe
+        if c_btn.button("👥 Grp" if must_group else "👤 Réserver", key=f"rech_{r['salle']}", use_container_width=True, disabled=not reservation_possible):
+            dt_debut = datetime.datetime.combine(date_choisie, time_choisi)
+            fin_eff = min(dt_debut + datetime.timedelta(hours=MAX_DUREE_HEURES), datetime.datetime.combine(date_choisie, r['fin'])).time()
+            confirm_booking_dialog(st.session_state.email, r['salle'], date_choisie, time_choisi, fin_eff, must_group)
+
+def vue_semaine():
+    if st.button("⬅️ Retour"): st.session_state.page="accueil"; st.rerun()
+    st.title("🗓️ Disponibilités de la semaine")
+    today = datetime.date.today()
+    if today.weekday() > 4: today += datetime.timedelta(days=(7-today.weekday()))
+    jours, curr = [], today
+    for i in range(5):
+        jours.append(curr); curr+=datetime.timedelta(days=1)
+        while curr.weekday()>4: curr+=datetime.timedelta(days=1)
+    etage = st.radio("Étage", ["P1", "P2", "P3", "P4"], horizontal=True)
+    salles, occupee = get_occupation_semaine(jours, etage)
+    if not salles:
+        st.warning("Aucune salle connue sur cet étage.")
+        return
+    heures = [f"{h}h" for h in HEURES_GRILLE]
+    st.write("#### 🟢 Salles libres par créneau")
+    libres = (~occupee).sum(axis=0)
+    st.dataframe({"Jour": [format_date_joli(d) for d in jours], **{h: libres[:, i].tolist() for i, h in enumerate(heures)}}, hide_index=True, use_container_width=True)
+    st.write("#### Détail par salle")
+    onglets = st.tabs([format_date_joli(d) for d in jours])
+    for j, onglet in enumerate(onglets):
+        with onglet:
+            grille = {"Salle": [s.replace(f"CC {etage} ", "") for s in salles]}
+            for i, h in enumerate(heures): grille[h] = ["🔴" if x else "🟢" for x in occupee[:, j, i]]
+            st.dataframe(grille, hide_index=True, use_container_width=True)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
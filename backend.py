@@ -0,0 +1,1774 @@
+import requests
+import numpy as np
+import datetime
+import sqlite3
+import hashlib
+import os
+import sys
+import time
+import random
+import bisect
+import json
+import queue
+import functools
+import threading
+import urllib.parse
+import contextlib
+import traceback
+import tempfile
+import collections
+import re
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from ical_parser import iter_evenements
+
+# --- CONFIGURATION ---
+FICHIER_LIENS = "mes_liens_ade.txt"
+DB_FILE = "radar_upec.db"
+CACHE_TIMEOUT = 1800 
+MAX_QUOTA_HEBDO = 3
+MAX_DUREE_HEURES = 2
+MIN_GROUPE = 5
+MIN_CONFIRMATION_REQUISE = 4
+CHECKIN_TIME_MIN = 15
+ADE_FETCH_TIMEOUT = 5
+ADE_MAX_WORKERS = 8
+CHUNK_ICAL = 64 * 1024
+
+# --- CONNEXIONS SQLITE ---
+# Pool de connexions partagé par tout le process (sessions Streamlit, thread de refresh) :
+# une connexion est empruntée avec get_conn() et rendue par conn.close().
+DB_BUSY_TIMEOUT = 5.0
+DB_MAX_RETRY = 5
+DB_POOL_MAX = 16
+_pools = {}
+_pools_lock = threading.Lock()
+_compteurs = threading.local()
+
+class ConnexionPoolee(sqlite3.Connection):
+    def cursor(self, factory=None):
+        # conn.execute() passe aussi par ici : toutes les requêtes sont chronométrées
+        return super().cursor(factory or CurseurMesure)
+
+    def close(self):
+        if self.in_transaction: self.rollback()
+        self.isolation_level = ""
+        try: _pools[self.db_file].put_nowait(self)
+        except queue.Full: super().close()
+
+def _compter_requete(_sql):
+    _compteurs.requetes = getattr(_compteurs, "requetes", 0) + 1
+
+def get_conn():
+    pool = _pools.get(DB_FILE)
+    if pool is None:
+        with _pools_lock: pool = _pools.setdefault(DB_FILE, queue.LifoQueue(maxsize=DB_POOL_MAX))
+    try: return pool.get_nowait()
+    except queue.Empty: pass
+    conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT, check_same_thread=False, factory=ConnexionPoolee)
+    conn.db_file = DB_FILE
+    # WAL : les lecteurs ne bloquent plus l'écrivain (et inversement)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-16000")
+    conn.set_trace_callback(_compter_requete)
+    _compteurs.connexions = getattr(_compteurs, "connexions", 0) + 1
+    return conn
+
+def reset_compteurs_db():
+    _compteurs.requetes = 0
+    _compteurs.connexions = 0
+
+def get_compteurs_db():
+    # (requêtes SQL, connexions ouvertes) du thread courant depuis reset_compteurs_db()
+    return getattr(_compteurs, "requetes", 0), getattr(_compteurs, "connexions", 0)
+
+def _est_verrou(e):
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+def retry_si_verrou(fn):
+    # Pour les écritures : si le busy timeout ne suffit pas, on rejoue toute la fonction
+    # (la transaction ratée n'a rien commité) avec un backoff aléatoire borné.
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for essai in range(DB_MAX_RETRY):
+            try: return fn(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _est_verrou(e) or essai == DB_MAX_RETRY - 1: raise
+            # hors du except : la connexion de l'essai raté est libérée avant d'attendre
+            time.sleep(random.uniform(0, 0.05 * 2 ** essai))
+    return wrapper
+
+# --- INSTRUMENTATION ---
+# Latences par (catégorie, nom) : "fonction" (fonctions publiques du backend, enveloppées en
+# fin de module), "sql" (chaque requête, fetch compris), "http" (flux ADE), "page" et
+# "fragment" (côté app). Les percentiles portent sur les MESURES_ECHANTILLONS derniers appels.
+MESURES_ACTIVES = True
+MESURES_ECHANTILLONS = 1000
+SEUIL_REQUETE_LENTE_MS = 50.0
+REQUETES_LENTES_MAX = 200
+_mesures = {}
+_mesures_lock = threading.Lock()
+_requetes_lentes = collections.deque(maxlen=REQUETES_LENTES_MAX)
+_RE_PLACEHOLDERS = re.compile(r"\?(\s*,\s*\?)+")
+
+def enregistrer_mesure(categorie, nom, duree_ms, requetes=0):
+    if not MESURES_ACTIVES: return
+    with _mesures_lock:
+        m = _mesures.get((categorie, nom))
+        if m is None:
+            m = _mesures[(categorie, nom)] = {"appels": 0, "total_ms": 0.0, "max_ms": 0.0, "requetes": 0,
+                                              "echantillons": collections.deque(maxlen=MESURES_ECHANTILLONS)}
+        m["appels"] += 1
+        m["total_ms"] += duree_ms
+        m["max_ms"] = max(m["max_ms"], duree_ms)
+        m["requetes"] += requetes
+        m["echantillons"].append(duree_ms)
+
+def _enregistrer_sql(sql, duree_ms):
+    # "IN (?, ?, ?)" et "IN (?)" comptent comme la même requête
+    sql = _RE_PLACEHOLDERS.sub("?", " ".join(sql.split()))
+    enregistrer_mesure("sql", sql, duree_ms, 1)
+    if duree_ms >= SEUIL_REQUETE_LENTE_MS:
+        _requetes_lentes.append({"ts": time.time(), "sql": sql, "duree_ms": round(duree_ms, 2),
+                                 "fonction": getattr(_compteurs, "fonction", None), "thread": threading.current_thread().name})
+
+class CurseurMesure(sqlite3.Cursor):
+    # La durée d'une requête court de execute() jusqu'au fetch qui suit : sqlite ne
+    # calcule qu'une ligne dans execute(), le reste du travail se fait pendant le fetch.
+    _en_cours = None
+
+    def _solder(self):
+        if self._en_cours:
+            _enregistrer_sql(*self._en_cours)
+            self._en_cours = None
+
+    def _chrono(self, methode, sql, *args):
+        self._solder()
+        t0 = time.perf_counter()
+        try: return methode(sql, *args)
+        finally: self._en_cours = [sql, (time.perf_counter() - t0) * 1000]
+
+    def execute(self, sql, params=()):
+        return self._chrono(super().execute, sql, params)
+
+    def executemany(self, sql, params):
+        return self._chrono(super().executemany, sql, params)
+
+    def _fetch(self, methode, *args):
+        t0 = time.perf_counter()
+        try: return methode(*args)
+        finally:
+            if self._en_cours: self._en_cours[1] += (time.perf_counter() - t0) * 1000
+            self._solder()
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def fetchmany(self, size=1):
+        return self._fetch(super().fetchmany, size)
+
+    def __del__(self):
+        try: self._solder()
+        except Exception: pass
+
+@contextlib.contextmanager
+def chrono(categorie, nom):
+    # Durée et nombre de requêtes SQL (thread courant) du bloc
+    req0 = getattr(_compteurs, "requetes", 0)
+    t0 = time.perf_counter()
+    try: yield
+    finally: enregistrer_mesure(categorie, nom, (time.perf_counter() - t0) * 1000, getattr(_compteurs, "requetes", 0) - req0)
+
+def mesurer(categorie="fonction"):
+    def decorateur(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not MESURES_ACTIVES: return fn(*args, **kwargs)
+            parent = getattr(_compteurs, "fonction", None)
+            _compteurs.fonction = fn.__name__
+            try:
+                with chrono(categorie, fn.__name__): return fn(*args, **kwargs)
+            finally: _compteurs.fonction = parent
+        return wrapper
+    return decorateur
+
+def get_mesures(categorie=None):
+    # [{categorie, nom, appels, total_ms, moyenne_ms, p50_ms, p95_ms, p99_ms, max_ms, requetes_par_appel}] par temps total décroissant
+    with _mesures_lock:
+        copie = [(cle, dict(m, echantillons=list(m["echantillons"]))) for cle, m in _mesures.items() if categorie in (None, cle[0])]
+    lignes = []
+    for (cat, nom), m in copie:
+        p50, p95, p99 = np.percentile(m["echantillons"], [50, 95, 99])
+        lignes.append({"categorie": cat, "nom": nom, "appels": m["appels"], "total_ms": round(m["total_ms"], 1),
+                       "moyenne_ms": round(m["total_ms"] / m["appels"], 2), "p50_ms": round(float(p50), 2),
+                       "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2), "max_ms": round(m["max_ms"], 2),
+                       "requetes_par_appel": round(m["requetes"] / m["appels"], 1)})
+    return sorted(lignes, key=lambda l: -l["total_ms"])
+
+def get_requetes_lentes():
+    return list(reversed(_requetes_lentes))
+
+def set_seuil_requete_lente(seuil_ms):
+    global SEUIL_REQUETE_LENTE_MS
+    SEUIL_REQUETE_LENTE_MS = float(seuil_ms)
+
+def reset_mesures():
+    with _mesures_lock: _mesures.clear()
+    _requetes_lentes.clear()
+
+def exporter_mesures(chemin=None):
+    # Dump JSON de toutes les mesures ; écrit aussi dans `chemin` si donné
+    dump = json.dumps({"ts": time.time(), "pid": os.getpid(), "seuil_requete_lente_ms": SEUIL_REQUETE_LENTE_MS,
+                       "mesures": get_mesures(), "requetes_lentes": get_requetes_lentes()}, ensure_ascii=False, indent=1)
+    if chemin:
+        with open(chemin, "w", encoding="utf-8") as f: f.write(dump)
+    return dump
+
+# --- INITIALISATION DB ---
+def init_db():
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS users (email TEXT PRIMARY KEY, password TEXT, nom TEXT, ade_url TEXT DEFAULT "")''')
+    c.execute('''CREATE TABLE IF NOT EXISTS reservations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, 
+        user_email TEXT, 
+        salle TEXT, 
+        date_str TEXT, 
+        start_time TEXT, 
+        end_time TEXT, 
+        participants TEXT DEFAULT "", 
+        confirmed_list TEXT DEFAULT ""
+    )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS admin_locks (salle TEXT PRIMARY KEY, reason TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS restrictions (salle TEXT, date_str TEXT, hour INTEGER, type TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS room_equipment (salle TEXT, icon TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS cache_ade (salle TEXT, debut TEXT, fin TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)''')
+    c.execute("INSERT OR IGNORE INTO metadata (key, value) VALUES ('force_groupe', '0')")
+    c.execute("INSERT OR IGNORE INTO metadata (key, value) VALUES ('data_version', '0')")
+    c.execute("INSERT OR IGNORE INTO metadata (key, value) VALUES ('equipements_version', '0')")
+    conn.commit()
+    appliquer_migrations(conn)
+    conn.close()
+
+# --- MIGRATIONS ---
+# Chaque migration fait évoluer une base existante d'une version à la suivante.
+# La version courante est dans metadata('schema_version') ; on n'ajoute que des
+# migrations à la fin de la liste, on ne modifie jamais une migration déjà livrée.
+def _colonnes(c, table):
+    c.execute(f"PRAGMA table_info({table})")
+    return [col[1] for col in c.fetchall()]
+
+def _migration_1_suivi_flux(c):
+    if "source" not in _colonnes(c, "cache_ade"):
+        c.execute("ALTER TABLE cache_ade ADD COLUMN source TEXT")
+    c.execute('''CREATE TABLE IF NOT EXISTS ade_feeds (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, digest TEXT)''')
+
+def _indexer_cache_ade(c):
+    # Aussi appelé après chaque swap de cache_ade (la table est recréée).
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cache_ade_debut ON cache_ade (debut, salle)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cache_ade_source ON cache_ade (source)")
+
+def _migration_2_index(c):
+    _indexer_cache_ade(c)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reservations_date ON reservations (date_str, salle, start_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reservations_user ON reservations (user_email, date_str)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_restrictions_salle ON restrictions (salle, date_str, hour)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_room_equipment_salle ON room_equipment (salle, icon)")
+
+def _migration_3_restrictions_jour(c):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_restrictions_date ON restrictions (date_str, hour)")
+
+def _migration_4_cache_plannings(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS feed_cache (url TEXT PRIMARY KEY, fetched_at REAL, last_access REAL, etag TEXT, last_modified TEXT, digest TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS feed_events (url TEXT, debut TEXT, fin TEXT, titre TEXT, lieu TEXT)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_feed_events_url ON feed_events (url, debut)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_feed_cache_access ON feed_cache (last_access)")
+
+def _migration_5_membres(c):
+    # Participants et check-ins normalisés : une ligne par (réservation, utilisateur).
+    # reservations.participants / confirmed_list restent comme copies pour l'affichage,
+    # réécrites depuis cette table par _maj_colonnes_membres().
+    c.execute('''CREATE TABLE IF NOT EXISTS reservation_members (
+        reservation_id INTEGER NOT NULL,
+        user_email TEXT NOT NULL,
+        role TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        date_str TEXT NOT NULL,
+        checked_in_at TEXT,
+        PRIMARY KEY (reservation_id, user_email)
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_members_user ON reservation_members (user_email, date_str)")
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_reservations_delete AFTER DELETE ON reservations
+        BEGIN DELETE FROM reservation_members WHERE reservation_id = OLD.id; END''')
+    c.execute("SELECT id, user_email, date_str, start_time, participants, confirmed_list FROM reservations")
+    for res_id, creator, date_s, start, parts_str, conf_str in c.fetchall():
+        membres = [creator] + [p for p in (parts_str or "").split(",") if p]
+        confirmes = [x for x in (conf_str or "").split(",") if x]
+        vus = set()
+        for pos, email in enumerate(membres):
+            if email in vus: continue
+            vus.add(email)
+            # heure de check-in inconnue pour l'historique : on prend le début du créneau
+            checkin = f"{date_s} {start}:00" if email in confirmes else None
+            c.execute("INSERT OR IGNORE INTO reservation_members VALUES (?, ?, ?, ?, ?, ?)",
+                      (res_id, email, "createur" if pos == 0 else "participant", pos, date_s, checkin))
+
+def _migration_6_no_show_log(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS no_show_log (ts REAL, reservation_id INTEGER, salle TEXT, date_str TEXT, start_time TEXT, end_time TEXT)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_no_show_log_ts ON no_show_log (ts)")
+
+def _migration_7_occupation(c):
+    if "rolled_up" not in _colonnes(c, "reservations"):
+        c.execute("ALTER TABLE reservations ADD COLUMN rolled_up INTEGER DEFAULT 0")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reservations_rollup ON reservations (rolled_up, date_str)")
+    c.execute('''CREATE TABLE IF NOT EXISTS occupation_jour (date_str TEXT, salle TEXT, etage TEXT, nb_resas INTEGER, minutes INTEGER,
+        nb_personnes INTEGER, nb_no_show INTEGER, PRIMARY KEY (date_str, salle))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS occupation_heure (date_str TEXT, salle TEXT, etage TEXT, hour INTEGER, nb_resas INTEGER,
+        PRIMARY KEY (date_str, salle, hour))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS reservations_archive (id INTEGER PRIMARY KEY, user_email TEXT, salle TEXT, date_str TEXT,
+        start_time TEXT, end_time TEXT, participants TEXT, confirmed_list TEXT)''')
+
+def _migration_8_creneaux(c):
+    # Une ligne par heure occupée : la clé primaire interdit deux réservations sur la même
+    # salle à la même heure, quel que soit le nombre d'écrivains concurrents.
+    c.execute('''CREATE TABLE IF NOT EXISTS reservation_slots (
+        salle TEXT NOT NULL,
+        date_str TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        reservation_id INTEGER NOT NULL,
+        PRIMARY KEY (salle, date_str, hour)
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_slots_reservation ON reservation_slots (reservation_id)")
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_reservations_delete_slots AFTER DELETE ON reservations
+        BEGIN DELETE FROM reservation_slots WHERE reservation_id = OLD.id; END''')
+    # doublons déjà en base : la plus ancienne réservation garde le créneau. Découpage en
+    # heures recopié ici (et non _heures_occupees) : la migration reste figée si la règle change.
+    c.execute("SELECT id, salle, date_str, start_time, end_time FROM reservations ORDER BY id")
+    creneaux = []
+    for res_id, salle, date_s, start, end in c.fetchall():
+        h_debut, h_fin = int(start[:2]), int(end[:2])
+        if end[3:5] != "00": h_fin += 1
+        creneaux += [(salle, date_s, h, res_id) for h in range(h_debut, max(h_fin, h_debut + 1))]
+    c.executemany("INSERT OR IGNORE INTO reservation_slots VALUES (?, ?, ?, ?)", creneaux)
+
+def _migration_9_registre_salles(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS salles (
+        nom TEXT PRIMARY KEY,
+        batiment TEXT,
+        etage TEXT,
+        niveau TEXT,
+        actif INTEGER NOT NULL DEFAULT 1,
+        source TEXT
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_salles_etage ON salles (etage, actif, niveau, nom)")
+    c.execute("SELECT DISTINCT salle FROM cache_ade UNION SELECT salle FROM reservations UNION SELECT salle FROM room_equipment")
+    # classement recopié ici (et non classer_salle) : la migration reste figée si la règle change
+    salles = []
+    for (nom,) in c.fetchall():
+        if not nom: continue
+        batiment, etage, niveau = (nom.split() or [None])[0], None, None
+        for e in ("P1", "P2", "P3", "P4"):
+            if f"CC {e}" in nom:
+                suffixe = nom.replace(f"CC {e} ", "")
+                batiment, etage = "CC", e
+                niveau = "Niveau Parking" if "P" in suffixe else "Niveau 1" if suffixe.startswith("1") else "Niveau 0"
+                break
+        salles.append((nom, batiment, etage, niveau, "ade"))
+    c.executemany("INSERT OR IGNORE INTO salles (nom, batiment, etage, niveau, source) VALUES (?, ?, ?, ?, ?)", salles)
+
+def _migration_10_journal_changements(c):
+    # Version par jour (= data_version de la dernière écriture qui a touché ce jour) et
+    # journal des (salle, heure) touchées ; salle NULL = toutes, hour NULL = toute la journée.
+    c.execute("CREATE TABLE IF NOT EXISTS versions_jour (date_str TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+    c.execute('''CREATE TABLE IF NOT EXISTS journal_changements (
+        version INTEGER NOT NULL,
+        date_str TEXT NOT NULL,
+        salle TEXT,
+        hour INTEGER,
+        source TEXT
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_journal_jour ON journal_changements (date_str, version)")
+
+MIGRATIONS = [
+    (1, _migration_1_suivi_flux),
+    (2, _migration_2_index),
+    (3, _migration_3_restrictions_jour),
+    (4, _migration_4_cache_plannings),
+    (5, _migration_5_membres),
+    (6, _migration_6_no_show_log),
+    (7, _migration_7_occupation),
+    (8, _migration_8_creneaux),
+    (9, _migration_9_registre_salles),
+    (10, _migration_10_journal_changements),
+]
+
+def get_schema_version(c):
+    c.execute("SELECT value FROM metadata WHERE key='schema_version'")
+    res = c.fetchone()
+    return int(res[0]) if res else 0
+
+def appliquer_migrations(conn):
+    c = conn.cursor()
+    for version, migration in MIGRATIONS:
+        if version <= get_schema_version(c): continue
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            # relu sous verrou : un autre process a pu migrer entre-temps
+            if version <= get_schema_version(c):
+                c.execute("ROLLBACK")
+                continue
+            migration(c)
+            c.execute("REPLACE INTO metadata (key, value) VALUES ('schema_version', ?)", (str(version),))
+            c.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction: c.execute("ROLLBACK")
+            raise
+
+# Requêtes chaudes : écrites une seule fois ici, exécutées telles quelles par leur fonction
+# et passées à EXPLAIN QUERY PLAN par verifier_plans_requetes() avec des paramètres d'exemple.
+SQL_PLANNING_JOUR = "SELECT salle, debut, fin FROM cache_ade WHERE debut >= ? AND debut <= ?"
+SQL_RESERVATIONS_JOUR = "SELECT salle, start_time, end_time, user_email, participants FROM reservations WHERE date_str=?"
+SQL_QUOTA_HEBDO = "SELECT COUNT(*) FROM reservation_members WHERE user_email=? AND date_str >= ? AND date_str <= ?"
+SQL_MES_RESERVATIONS = """SELECT r.salle, r.date_str, r.start_time, r.end_time, r.confirmed_list, r.id, r.participants, r.user_email
+                 FROM reservation_members m JOIN reservations r ON r.id = m.reservation_id
+                 WHERE m.user_email=? AND m.date_str >= ? ORDER BY m.date_str ASC"""
+SQL_CRENEAU_BLOQUE = "SELECT 1 FROM restrictions WHERE salle=? AND date_str=? AND hour IN (-1, ?) AND type IN ('BLOCK', 'DAY_BLOCK')"
+SQL_SALLES_ETAGE = "SELECT nom, niveau FROM salles WHERE etage=? AND actif=1 ORDER BY niveau, nom"
+SQL_RESTRICTION = "SELECT type FROM restrictions WHERE salle=? AND date_str=? AND hour=?"
+SQL_EQUIPEMENT = "SELECT icon FROM room_equipment WHERE salle=? AND icon=?"
+SQL_RESTRICTIONS_JOUR = "SELECT salle, hour, type FROM restrictions WHERE date_str=?"
+SQL_A_CONSOLIDER = """SELECT r.id, r.salle, r.date_str, r.start_time, r.end_time, COUNT(m.user_email)
+                 FROM reservations r LEFT JOIN reservation_members m ON m.reservation_id = r.id
+                 WHERE r.rolled_up = 0 AND (r.date_str < ? OR (r.date_str = ? AND r.end_time <= ?))
+                 GROUP BY r.id"""
+SQL_HISTORIQUE_JOUR = """SELECT date_str, etage, SUM(nb_resas), SUM(minutes), SUM(nb_no_show) FROM occupation_jour
+                 WHERE date_str >= ? AND date_str <= ? GROUP BY date_str, etage"""
+SQL_HISTORIQUE_HEURE = "SELECT hour, SUM(nb_resas) FROM occupation_heure WHERE date_str >= ? AND date_str <= ? GROUP BY hour"
+SQL_VERSION_DONNEES = "SELECT value FROM metadata WHERE key='data_version'"
+SQL_VERSION_EQUIPEMENTS = "SELECT value FROM metadata WHERE key='equipements_version'"
+SQL_VERSION_JOUR = "SELECT version FROM versions_jour WHERE date_str=?"
+SQL_CHANGEMENTS = "SELECT salle, hour FROM journal_changements WHERE date_str=? AND version > ?"
+# {marques} = un "?" par URL
+SQL_MON_PLANNING = "SELECT titre, lieu, debut, fin FROM feed_events WHERE url IN ({marques}) AND debut >= ? AND debut < ? ORDER BY debut"
+
+REQUETES_CHAUDES = {
+    "get_planning_sql": (SQL_PLANNING_JOUR, ("2026-01-05T00:00:00", "2026-01-05T23:59:00")),
+    "get_db_reservations": (SQL_RESERVATIONS_JOUR, ("2026-01-05",)),
+    "verifier_quota_hebdo": (SQL_QUOTA_HEBDO, ("a@u-pec.fr", "2026-01-05", "2026-01-11")),
+    "get_mes_reservations_futures": (SQL_MES_RESERVATIONS, ("a@u-pec.fr", "2026-01-05")),
+    "manage_clic_salle": (SQL_CRENEAU_BLOQUE, ("CC P1 101", "2026-01-05", 10)),
+    "get_salles_etage": (SQL_SALLES_ETAGE, ("P1",)),
+    "get_restriction": (SQL_RESTRICTION, ("CC P1 101", "2026-01-05", 10)),
+    "toggle_equipment": (SQL_EQUIPEMENT, ("CC P1 101", "💻")),
+    "get_restrictions_jour": (SQL_RESTRICTIONS_JOUR, ("2026-01-05",)),
+    "consolider_occupation": (SQL_A_CONSOLIDER, ("2026-01-05", "2026-01-05", "10:00")),
+    "get_historique_occupation": (SQL_HISTORIQUE_JOUR, ("2026-01-05", "2026-02-05")),
+    "get_historique_occupation (heures)": (SQL_HISTORIQUE_HEURE, ("2026-01-05", "2026-02-05")),
+    "get_version_donnees": (SQL_VERSION_DONNEES, ()),
+    "get_equipements": (SQL_VERSION_EQUIPEMENTS, ()),
+    "get_version_jour": (SQL_VERSION_JOUR, ("2026-01-05",)),
+    "get_changements_depuis": (SQL_CHANGEMENTS, ("2026-01-05", 10)),
+    "get_mon_planning": (SQL_MON_PLANNING.format(marques="?"), ("https://x/", "2026-01-05T00:00:00", "2026-01-07T00:00:00")),
+}
+
+def verifier_plans_requetes():
+    # {nom: (utilise_un_index, détail EXPLAIN QUERY PLAN)}
+    conn = get_conn()
+    c = conn.cursor()
+    resultats = {}
+    for nom, (sql, params) in REQUETES_CHAUDES.items():
+        c.execute("EXPLAIN QUERY PLAN " + sql, params)
+        details = [r[3] for r in c.fetchall()]
+        resultats[nom] = (not any(d.startswith("SCAN") for d in details), " | ".join(details))
+    conn.close()
+    return resultats
+
+# --- BACKEND UTILS ---
+
+JOURS_FR = {0: "Lundi", 1: "Mardi", 2: "Mercredi", 3: "Jeudi", 4: "Vendredi", 5: "Samedi", 6: "Dimanche"}
+MOIS_FR = {1: "Janvier", 2: "Février", 3: "Mars", 4: "Avril", 5: "Mai", 6: "Juin", 7: "Juillet", 8: "Août", 9: "Septembre", 10: "Octobre", 11: "Novembre", 12: "Décembre"}
+
+def format_date_joli(date_obj):
+    return f"{JOURS_FR[date_obj.weekday()]} {date_obj.day} {MOIS_FR[date_obj.month]}"
+
+def hash_password(password):
+    return hashlib.sha256(str.encode(password)).hexdigest()
+
+def verifier_connexion(email, password):
+    if email == "admin" and password == "admin": return ("Administrateur", "")
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT nom, ade_url FROM users WHERE email=? AND password=?", (email, hash_password(password)))
+    result = c.fetchone()
+    conn.close()
+    return result if result else (None, None)
+
+@retry_si_verrou
+def creer_compte(email, password, nom):
+    conn = get_conn()
+    c = conn.cursor()
+    try:
+        c.execute("INSERT INTO users (email, password, nom, ade_url) VALUES (?, ?, ?, '')", (email, hash_password(password), nom))
+        conn.commit()
+        return True
+    except sqlite3.IntegrityError:
+        return False
+    finally:
+        conn.close()
+
+@retry_si_verrou
+def save_ade_url(email, url):
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("UPDATE users SET ade_url=? WHERE email=?", (url, email))
+    conn.commit()
+    conn.close()
+
+# --- PLANNINGS PERSO (cache partagé) ---
+# Beaucoup d'étudiants d'une même promo collent le même lien de groupe : les flux sont
+# mis en cache par URL normalisée, pour tous les utilisateurs, dans la base (survit aux
+# redémarrages). Au-delà de PLANNING_CACHE_MAX flux, les moins consultés sont évincés.
+# Une consultation n'écrit pas en base : elle est notée en mémoire et reportée dans
+# feed_cache.last_access au prochain enregistrement de flux, juste avant l'éviction.
+PLANNING_TTL = 1800
+PLANNING_CACHE_MAX = 500
+PLANNING_VERROUS = 16
+# nombre fixe de verrous (URL hachée) : les URL viennent des utilisateurs
+_verrous_flux = [threading.Lock() for _ in range(PLANNING_VERROUS)]
+_acces_flux = {}
+_acces_flux_lock = threading.Lock()
+
+def normaliser_url_ical(url):
+    p = urllib.parse.urlsplit(url.strip())
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(p.query, keep_blank_values=True)))
+    return urllib.parse.urlunsplit((p.scheme.lower(), p.netloc.lower(), p.path or "/", query, ""))
+
+def _verrou_flux(url):
+    return _verrous_flux[hash(url) % PLANNING_VERROUS]
+
+def _noter_acces_flux(urls):
+    now_ts = time.time()
+    with _acces_flux_lock:
+        for u in urls: _acces_flux[u] = now_ts
+
+@retry_si_verrou
+def _enregistrer_flux_perso(flux):
+    conn = get_conn()
+    c = conn.cursor()
+    now_ts = time.time()
+    if flux["fichier"] is not None:
+        flux["fichier"].seek(0)
+        c.execute("DELETE FROM feed_events WHERE url=?", (flux["url"],))
+        c.executemany("INSERT INTO feed_events (url, debut, fin, titre, lieu) VALUES (?, ?, ?, ?, ?)",
+                      ((flux["url"], ev["debut"].isoformat(), ev["fin"].isoformat(), ev["titre"], ev["lieu"]) for ev in iter_evenements(chunks_fichier(flux["fichier"]))))
+    c.execute("""INSERT INTO feed_cache (url, fetched_at, last_access, etag, last_modified, digest) VALUES (?, ?, ?, ?, ?, ?)
+                 ON CONFLICT(url) DO UPDATE SET fetched_at=excluded.fetched_at, last_access=excluded.last_access,
+                 etag=excluded.etag, last_modified=excluded.last_modified, digest=excluded.digest""",
+              (flux["url"], now_ts, now_ts, flux["etag"], flux["last_modified"], flux["digest"]))
+    with _acces_flux_lock: acces = dict(_acces_flux)
+    c.executemany("UPDATE feed_cache SET last_access=? WHERE url=? AND last_access < ?", [(ts, u, ts) for u, ts in acces.items()])
+    # éviction LRU
+    c.execute("SELECT url FROM feed_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?", (PLANNING_CACHE_MAX,))
+    evinces = [(r[0],) for r in c.fetchall()]
+    if evinces:
+        c.executemany("DELETE FROM feed_events WHERE url=?", evinces)
+        c.executemany("DELETE FROM feed_cache WHERE url=?", evinces)
+    conn.commit()
+    conn.close()
+    # reportées en base : on ne les oublie que si aucune consultation plus récente n'est arrivée
+    with _acces_flux_lock:
+        for u, ts in acces.items():
+            if _acces_flux.get(u) == ts: del _acces_flux[u]
+
+def _rafraichir_flux_perso(url, etat):
+    # Un seul téléchargement par flux à la fois : les autres attendent puis relisent.
+    with _verrou_flux(url):
+        conn = get_conn()
+        c = conn.cursor()
+        c.execute("SELECT fetched_at, etag, last_modified, digest FROM feed_cache WHERE url=?", (url,))
+        row = c.fetchone()
+        conn.close()
+        if row and time.time() - row[0] <= PLANNING_TTL: return
+        flux = fetch_flux_ade(url, row[1:] if row else etat)
+        # en cas d'erreur on garde les anciens événements, on réessaiera au prochain affichage
+        try:
+            if flux["resultat"] != "erreur": _enregistrer_flux_perso(flux)
+        finally:
+            fermer_flux([flux])
+
+def get_mon_planning(raw_urls, date_debut=None, date_fin=None):
+    # Événements des flux de l'utilisateur, triés ; limités à [date_debut, date_fin[ si donnés.
+    if not raw_urls: return []
+    urls = sorted(set(normaliser_url_ical(u) for u in raw_urls.split('\n') if u.strip().startswith("http")))
+    if not urls: return []
+    marques = ",".join("?" * len(urls))
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(f"SELECT url, fetched_at FROM feed_cache WHERE url IN ({marques})", urls)
+    frais = {r[0] for r in c.fetchall() if time.time() - r[1] <= PLANNING_TTL}
+    conn.close()
+    perimes = [u for u in urls if u not in frais]
+    if perimes:
+        with ThreadPoolExecutor(max_workers=min(ADE_MAX_WORKERS, len(perimes))) as pool:
+            list(pool.map(lambda u: _rafraichir_flux_perso(u, None), perimes))
+    conn = get_conn()
+    c = conn.cursor()
+    borne_debut = datetime.datetime.combine(date_debut, datetime.time(0, 0)).isoformat() if date_debut else ""
+    borne_fin = datetime.datetime.combine(date_fin, datetime.time(0, 0)).isoformat() if date_fin else "9999"
+    c.execute(SQL_MON_PLANNING.format(marques=marques), urls + [borne_debut, borne_fin])
+    rows = c.fetchall()
+    conn.close()
+    _noter_acces_flux(urls)
+    return [{"titre": r[0], "lieu": r[1], "debut": datetime.datetime.fromisoformat(r[2]), "fin": datetime.datetime.fromisoformat(r[3])} for r in rows]
+
+# --- METIERS ---
+@retry_si_verrou
+def toggle_equipment(salle, icon):
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_EQUIPEMENT, (salle, icon))
+    if c.fetchone(): c.execute("DELETE FROM room_equipment WHERE salle=? AND icon=?", (salle, icon))
+    else: c.execute("INSERT INTO room_equipment VALUES (?, ?)", (salle, icon))
+    c.execute("UPDATE metadata SET value = CAST(value AS INTEGER) + 1 WHERE key='equipements_version'")
+    _incrementer_version(c)
+    conn.commit()
+    conn.close()
+    invalider_cache_equipements()
+
+# Équipements : table minuscule et lue à chaque grille de salles -> gardée en mémoire
+# pour tout le process, rechargée en une requête après chaque toggle_equipment(), ici ou
+# dans un autre process (l'API JSON) : l'entrée porte 'equipements_version', que seul
+# toggle_equipment() incrémente (data_version bouge à chaque réservation).
+_cache_equipements = {}
+_cache_equipements_lock = threading.Lock()
+
+def get_equipements():
+    # {salle: [icônes]} pour toutes les salles
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_VERSION_EQUIPEMENTS)
+    res = c.fetchone()
+    conn.close()
+    version = int(res[0]) if res else 0
+    with _cache_equipements_lock:
+        entree = _cache_equipements.get(DB_FILE)
+        if entree is None or entree[0] < version:
+            conn = get_conn()
+            c = conn.cursor()
+            c.execute("SELECT salle, icon FROM room_equipment ORDER BY rowid")
+            equip = {}
+            for salle, icon in c.fetchall(): equip.setdefault(salle, []).append(icon)
+            conn.close()
+            entree = _cache_equipements[DB_FILE] = (version, equip)
+        return entree[1]
+
+def get_equipements_salles(salles):
+    equip = get_equipements()
+    return {s: equip.get(s, []) for s in salles}
+
+def invalider_cache_equipements():
+    with _cache_equipements_lock:
+        _cache_equipements.pop(DB_FILE, None)
+
+def format_icones(icones):
+    return " " + " ".join(icones) if icones else ""
+
+def get_room_icons(salle):
+    return format_icones(get_equipements().get(salle, []))
+
+def has_equipment(salle, icon):
+    return icon in get_equipements().get(salle, [])
+
+def get_admin_config_groupe():
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT value FROM metadata WHERE key='force_groupe'")
+    res = c.fetchone()
+    conn.close()
+    return res[0] == "1" if res else False
+
+@retry_si_verrou
+def set_admin_config_groupe(actif: bool):
+    val = "1" if actif else "0"
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("REPLACE INTO metadata (key, value) VALUES ('force_groupe', ?)", (val,))
+    _incrementer_version(c)
+    conn.commit()
+    conn.close()
+
+@retry_si_verrou
+def clean_no_show_reservations():
+    # Supprime en une requête les réservations commencées depuis plus de CHECKIN_TIME_MIN
+    # sans assez de check-ins (aucun en solo, moins de MIN_CONFIRMATION_REQUISE en groupe).
+    # Les créneaux libérés sont journalisés dans no_show_log et renvoyés.
+    conn = get_conn()
+    c = conn.cursor()
+    today_s = datetime.date.today().strftime("%Y-%m-%d")
+    now = datetime.datetime.now()
+    limit_time = (now - datetime.timedelta(minutes=CHECKIN_TIME_MIN)).strftime("%H:%M")
+    c.execute("""DELETE FROM reservations WHERE id IN (
+                     SELECT r.id FROM reservations r JOIN reservation_members m ON m.reservation_id = r.id
+                     WHERE r.date_str=? AND r.start_time < ?
+                     GROUP BY r.id
+                     HAVING (COUNT(*) > 1 AND COUNT(m.checked_in_at) < ?) OR (COUNT(*) = 1 AND COUNT(m.checked_in_at) = 0))
+                 RETURNING id, salle, date_str, start_time, end_time""", (today_s, limit_time, MIN_CONFIRMATION_REQUISE))
+    liberes = c.fetchall()
+    now_ts = time.time()
+    if liberes:
+        _compter_no_shows(c, liberes)
+        c.executemany("INSERT INTO no_show_log (ts, reservation_id, salle, date_str, start_time, end_time) VALUES (?, ?, ?, ?, ?, ?)",
+                      [(now_ts,) + r for r in liberes])
+    c.execute("REPLACE INTO metadata VALUES ('no_show_stats', ?)", (json.dumps({"date": now_ts, "liberees": len(liberes)}),))
+    if liberes: _noter_changements(c, [(r[2], r[1], h) for r in liberes for h in _heures_occupees(r[3], r[4])], "no-show")
+    conn.commit()
+    conn.close()
+    return liberes
+
+def get_creneaux_liberes(depuis_ts, date_obj=None):
+    # Créneaux libérés par le balayage depuis depuis_ts : [(ts, salle, date_str, start_time, end_time)]
+    conn = get_conn()
+    c = conn.cursor()
+    sql = "SELECT ts, salle, date_str, start_time, end_time FROM no_show_log WHERE ts > ?"
+    params = [depuis_ts]
+    if date_obj:
+        sql += " AND date_str=?"
+        params.append(date_obj.strftime("%Y-%m-%d"))
+    c.execute(sql + " ORDER BY ts", params)
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def _maj_colonnes_membres(c, res_id):
+    # Recopie reservation_members dans les colonnes texte de reservations (affichage).
+    c.execute("SELECT user_email, role, checked_in_at FROM reservation_members WHERE reservation_id=? ORDER BY position", (res_id,))
+    rows = c.fetchall()
+    parts = [r[0] for r in rows if r[1] != "createur"]
+    confirmes = [r[0] for r in sorted((r for r in rows if r[2]), key=lambda r: r[2])]
+    c.execute("UPDATE reservations SET participants=?, confirmed_list=? WHERE id=?", (",".join(parts), ",".join(confirmes), res_id))
+
+def _get_participants(c, res_id):
+    c.execute("SELECT user_email FROM reservation_members WHERE reservation_id=? AND role='participant' ORDER BY position", (res_id,))
+    return [r[0] for r in c.fetchall()]
+
+@retry_si_verrou
+def confirm_reservation_user(res_id, user_email):
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("UPDATE reservation_members SET checked_in_at=? WHERE reservation_id=? AND user_email=? AND checked_in_at IS NULL",
+              (datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), res_id, user_email))
+    if c.rowcount:
+        _maj_colonnes_membres(c, res_id)
+        # pas de créneau touché, mais /reservations de l'API affiche les check-ins
+        _incrementer_version(c)
+    conn.commit()
+    conn.close()
+
+def verifier_quota_hebdo(email, date_obj):
+    conn = get_conn()
+    c = conn.cursor()
+    start_week = date_obj - datetime.timedelta(days=date_obj.weekday())
+    end_week = start_week + datetime.timedelta(days=6)
+    c.execute(SQL_QUOTA_HEBDO, (email, start_week.strftime("%Y-%m-%d"), end_week.strftime("%Y-%m-%d")))
+    count = c.fetchone()[0]
+    conn.close()
+    return count < MAX_QUOTA_HEBDO, count
+
+def get_restriction(salle, date_obj, hour):
+    conn = get_conn()
+    c = conn.cursor()
+    date_s = date_obj.strftime("%Y-%m-%d")
+    c.execute(SQL_RESTRICTION, (salle, date_s, -1))
+    res_day = c.fetchone()
+    if res_day: 
+        conn.close()
+        return res_day[0]
+    c.execute(SQL_RESTRICTION, (salle, date_s, hour))
+    res_hour = c.fetchone()
+    conn.close()
+    return res_hour[0] if res_hour else None
+
+def set_restriction(salle, date_obj, hour, type_rest):
+    return appliquer_restrictions([salle], date_obj, [hour], type_rest)
+
+@retry_si_verrou
+def appliquer_restrictions(salles, date_obj, heures, type_rest):
+    # Pose BLOCK / GROUP / DAY_BLOCK ou lève (NONE) sur salles x heures, en une seule transaction
+    # avec les suppressions de réservations qui vont avec. Mêmes règles que l'ancien set_restriction :
+    # DAY_BLOCK ignore les heures et vide la journée, BLOCK supprime les réservations qui commencent
+    # à l'heure bloquée, NONE lève aussi un éventuel blocage journée.
+    t0 = time.perf_counter()
+    date_s = date_obj.strftime("%Y-%m-%d")
+    salles, heures = list(dict.fromkeys(salles)), sorted(set(heures))
+    rapport = {"type": type_rest, "date": date_s, "salles": len(salles), "heures": heures,
+               "restrictions_posees": 0, "restrictions_levees": 0, "reservations_supprimees": 0}
+    conn = get_conn()
+    conn.isolation_level = None
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        # créneaux touchés : les restrictions dont l'effet change (un BLOCK reposé ou un NONE
+        # sur une salle libre ne fait pas monter les versions), plus les réservations supprimées
+        cibles = set(salles)
+        c.execute(SQL_RESTRICTIONS_JOUR, (date_s,))
+        avant = {(s, h): t for s, h, t in c.fetchall() if s in cibles}
+        if type_rest == "DAY_BLOCK": changements = [(date_s, s, None) for s in salles if avant.get((s, -1)) != "DAY_BLOCK"]
+        elif type_rest == "NONE":
+            changements = [(date_s, s, None) for s in salles if (s, -1) in avant]
+            changements += [(date_s, s, h) for s in salles for h in heures if (s, h) in avant]
+        else: changements = [(date_s, s, h) for s in salles for h in heures if avant.get((s, h)) != type_rest]
+        if type_rest in ("DAY_BLOCK", "BLOCK"):
+            c.execute("SELECT salle, start_time, end_time FROM reservations WHERE date_str=?", (date_s,))
+            debuts = {f"{h:02d}:00" for h in heures}
+            changements += [(date_s, r[0], h) for r in c.fetchall() if r[0] in cibles and (type_rest == "DAY_BLOCK" or r[1] in debuts)
+                            for h in _heures_occupees(r[1], r[2])]
+        if type_rest == "DAY_BLOCK":
+            c.executemany("DELETE FROM restrictions WHERE salle=? AND date_str=?", [(s, date_s) for s in salles])
+            rapport["restrictions_levees"] = c.rowcount
+            c.executemany("INSERT INTO restrictions VALUES (?, ?, -1, 'DAY_BLOCK')", [(s, date_s) for s in salles])
+            rapport["restrictions_posees"] = c.rowcount
+            c.executemany("DELETE FROM reservations WHERE salle=? AND date_str=?", [(s, date_s) for s in salles])
+            rapport["reservations_supprimees"] = c.rowcount
+        elif type_rest == "NONE":
+            c.executemany("DELETE FROM restrictions WHERE salle=? AND date_str=? AND (hour=? OR hour=-1)",
+                          [(s, date_s, h) for s in salles for h in heures])
+            rapport["restrictions_levees"] = c.rowcount
+        else:
+            cles = [(s, date_s, h) for s in salles for h in heures]
+            c.executemany("DELETE FROM restrictions WHERE salle=? AND date_str=? AND hour=?", cles)
+            rapport["restrictions_levees"] = c.rowcount
+            c.executemany("INSERT INTO restrictions VALUES (?, ?, ?, ?)", [k + (type_rest,) for k in cles])
+            rapport["restrictions_posees"] = c.rowcount
+            if type_rest == "BLOCK":
+                c.executemany("DELETE FROM reservations WHERE salle=? AND date_str=? AND start_time=?",
+                              [(s, date_s, f"{h:02d}:00") for s in salles for h in heures])
+                rapport["reservations_supprimees"] = c.rowcount
+        if changements: _noter_changements(c, changements, "restriction")
+        c.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction: c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    rapport["duree_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return rapport
+
+def admin_mass_lock_etage(date_obj, hour, salles_list, type_rest="BLOCK"):
+    return appliquer_restrictions(salles_list, date_obj, [hour], type_rest)
+
+# --- REGISTRE DES SALLES ---
+# Une ligne par salle connue, classée une fois pour toutes (bâtiment, étage, niveau).
+# Alimenté à chaque ingestion ADE ; les corrections de l'admin ne sont jamais écrasées.
+NIVEAUX = ["Niveau Parking", "Niveau 0", "Niveau 1"]
+
+def classer_salle(nom):
+    # "CC P1 105" -> ("CC", "P1", "Niveau 1") ; hors CC : (premier mot, None, None)
+    for etage in ("P1", "P2", "P3", "P4"):
+        if f"CC {etage}" in nom:
+            suffixe = nom.replace(f"CC {etage} ", "")
+            if "P" in suffixe: return "CC", etage, "Niveau Parking"
+            if suffixe.startswith("1"): return "CC", etage, "Niveau 1"
+            return "CC", etage, "Niveau 0"
+    return (nom.split() or [None])[0], None, None
+
+def _enregistrer_salles(c, noms, source):
+    c.executemany("INSERT OR IGNORE INTO salles (nom, batiment, etage, niveau, source) VALUES (?, ?, ?, ?, ?)",
+                  [(n,) + classer_salle(n) + (source,) for n in noms])
+
+def get_salles_etage(etage):
+    # {niveau: [salles]} pour un étage, salles masquées par l'admin exclues
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_SALLES_ETAGE, (etage,))
+    rows = c.fetchall()
+    conn.close()
+    groupes = {n: [] for n in NIVEAUX}
+    for nom, niveau in rows: groupes.setdefault(niveau, []).append(nom)
+    return groupes
+
+def get_salles_actives():
+    # [(salle, étage)] de tous les étages, pour la recherche campus
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT nom, etage FROM salles WHERE etage IS NOT NULL AND actif=1")
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def get_registre_salles(etage=None):
+    # [(nom, batiment, etage, niveau, actif)] pour l'admin, masquées comprises
+    conn = get_conn()
+    c = conn.cursor()
+    if etage: c.execute("SELECT nom, batiment, etage, niveau, actif FROM salles WHERE etage=? ORDER BY niveau, nom", (etage,))
+    else: c.execute("SELECT nom, batiment, etage, niveau, actif FROM salles ORDER BY etage, niveau, nom")
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+@retry_si_verrou
+def ajouter_salle(nom):
+    nom = nom.strip()
+    if not nom: return False
+    conn = get_conn()
+    c = conn.cursor()
+    _enregistrer_salles(c, [nom], "admin")
+    ajoutee = c.rowcount > 0
+    if ajoutee: _incrementer_version(c)
+    conn.commit()
+    conn.close()
+    return ajoutee
+
+@retry_si_verrou
+def maj_salle(nom, etage, niveau, actif):
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("UPDATE salles SET etage=?, niveau=?, actif=?, source='admin' WHERE nom=?", (etage, niveau, int(actif), nom))
+    _incrementer_version(c)
+    conn.commit()
+    conn.close()
+
+def etage_de_salle(salle):
+    for etage in ("P1", "P2", "P3", "P4"):
+        if etage in salle: return etage
+    return None
+
+# même règle que etage_de_salle(), en SQL
+_SQL_ETAGE = "CASE WHEN instr(salle, 'P1') THEN 'P1' WHEN instr(salle, 'P2') THEN 'P2' WHEN instr(salle, 'P3') THEN 'P3' WHEN instr(salle, 'P4') THEN 'P4' END"
+
+def get_stats_admin():
+    conn = get_conn()
+    c = conn.cursor()
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    # une seule passe : (étage, heure de début) -> nombre
+    c.execute(f"""SELECT {_SQL_ETAGE} AS etage, CAST(substr(start_time, 1, instr(start_time, ':') - 1) AS INTEGER) AS h, COUNT(*)
+                  FROM reservations WHERE date_str=? GROUP BY etage, h""", (today,))
+    rows = c.fetchall()
+    conn.close()
+    total = 0
+    etages = {"P1": 0, "P2": 0, "P3": 0, "P4": 0}
+    heures = {f"{h}h": 0 for h in range(8, 21)}
+    for etage, h, nb in rows:
+        total += nb
+        if etage: etages[etage] += nb
+        if f"{h}h" in heures: heures[f"{h}h"] += nb
+    return total, etages, heures
+
+# --- HISTORIQUE D'OCCUPATION ---
+# Les réservations terminées sont agrégées une fois pour toutes dans occupation_jour
+# (salle x jour) et occupation_heure (salle x jour x heure) ; les no-shows balayés y sont
+# comptés à part. Les lignes agrégées de plus de RETENTION_JOURS partent ensuite dans
+# reservations_archive : les graphiques ne lisent jamais la table reservations.
+CONSOLIDATION_TICK = 300
+ARCHIVE_TICK = 3600
+RETENTION_JOURS = 30
+
+def _heures_occupees(start_time, end_time):
+    h_debut, h_fin = int(start_time[:2]), int(end_time[:2])
+    if end_time[3:5] != "00": h_fin += 1
+    return range(h_debut, max(h_fin, h_debut + 1))
+
+def _minutes(start_time, end_time):
+    return (int(end_time[:2]) * 60 + int(end_time[3:5])) - (int(start_time[:2]) * 60 + int(start_time[3:5]))
+
+@retry_si_verrou
+def consolider_occupation():
+    conn = get_conn()
+    c = conn.cursor()
+    now = datetime.datetime.now()
+    today_s, now_s = now.strftime("%Y-%m-%d"), now.strftime("%H:%M")
+    c.execute(SQL_A_CONSOLIDER, (today_s, today_s, now_s))
+    rows = c.fetchall()
+    jour, heure = {}, {}
+    for res_id, salle, date_s, start, end, nb_pers in rows:
+        k = (date_s, salle)
+        nb, minutes, pers = jour.get(k, (0, 0, 0))
+        jour[k] = (nb + 1, minutes + _minutes(start, end), pers + max(nb_pers, 1))
+        for h in _heures_occupees(start, end):
+            heure[(date_s, salle, h)] = heure.get((date_s, salle, h), 0) + 1
+    c.executemany("""INSERT INTO occupation_jour (date_str, salle, etage, nb_resas, minutes, nb_personnes, nb_no_show) VALUES (?, ?, ?, ?, ?, ?, 0)
+                     ON CONFLICT(date_str, salle) DO UPDATE SET nb_resas = nb_resas + excluded.nb_resas,
+                     minutes = minutes + excluded.minutes, nb_personnes = nb_personnes + excluded.nb_personnes""",
+                  [(d, s, etage_de_salle(s), v[0], v[1], v[2]) for (d, s), v in jour.items()])
+    c.executemany("""INSERT INTO occupation_heure (date_str, salle, etage, hour, nb_resas) VALUES (?, ?, ?, ?, ?)
+                     ON CONFLICT(date_str, salle, hour) DO UPDATE SET nb_resas = nb_resas + excluded.nb_resas""",
+                  [(d, s, etage_de_salle(s), h, v) for (d, s, h), v in heure.items()])
+    c.executemany("UPDATE reservations SET rolled_up = 1 WHERE id=?", [(r[0],) for r in rows])
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+def _compter_no_shows(c, liberes):
+    # liberes : [(id, salle, date_str, start_time, end_time)] renvoyé par le balayage
+    par_salle = {}
+    for r in liberes: par_salle[(r[2], r[1])] = par_salle.get((r[2], r[1]), 0) + 1
+    c.executemany("""INSERT INTO occupation_jour (date_str, salle, etage, nb_resas, minutes, nb_personnes, nb_no_show) VALUES (?, ?, ?, 0, 0, 0, ?)
+                     ON CONFLICT(date_str, salle) DO UPDATE SET nb_no_show = nb_no_show + excluded.nb_no_show""",
+                  [(d, s, etage_de_salle(s), n) for (d, s), n in par_salle.items()])
+
+@retry_si_verrou
+def archiver_reservations(retention_jours=None):
+    # Déplace les réservations déjà agrégées et plus vieilles que la rétention (0 = jusqu'à hier).
+    jour_limite = datetime.date.today() - datetime.timedelta(days=RETENTION_JOURS if retention_jours is None else retention_jours)
+    limite = jour_limite.strftime("%Y-%m-%d")
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("""INSERT INTO reservations_archive (id, user_email, salle, date_str, start_time, end_time, participants, confirmed_list)
+                 SELECT id, user_email, salle, date_str, start_time, end_time, participants, confirmed_list
+                 FROM reservations WHERE rolled_up = 1 AND date_str < ?""", (limite,))
+    nb = c.rowcount
+    if nb:
+        c.execute("SELECT DISTINCT date_str FROM reservations WHERE rolled_up = 1 AND date_str < ?", (limite,))
+        _noter_changements(c, [(r[0], None, None) for r in c.fetchall()], "archive")
+    c.execute("DELETE FROM reservations WHERE rolled_up = 1 AND date_str < ?", (limite,))
+    # passé la rétention, un client en retard sur ces jours recharge tout (voir get_changements_depuis)
+    c.execute("DELETE FROM journal_changements WHERE date_str < ?", (limite,))
+    # les no-shows sont déjà comptés dans occupation_jour
+    c.execute("DELETE FROM no_show_log WHERE ts < ?", (datetime.datetime.combine(jour_limite, datetime.time(0, 0)).timestamp(),))
+    conn.commit()
+    conn.close()
+    return nb
+
+def get_historique_occupation(date_debut, date_fin):
+    # Séries pour le dashboard sur [date_debut, date_fin], lues uniquement dans les agrégats.
+    d1, d2 = date_debut.strftime("%Y-%m-%d"), date_fin.strftime("%Y-%m-%d")
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_HISTORIQUE_JOUR, (d1, d2))
+    rows_jour = c.fetchall()
+    c.execute(SQL_HISTORIQUE_HEURE, (d1, d2))
+    rows_heure = c.fetchall()
+    conn.close()
+    par_jour, par_etage, no_shows = {}, {"P1": 0, "P2": 0, "P3": 0, "P4": 0}, 0
+    for date_s, etage, nb, minutes, ns in rows_jour:
+        par_jour[date_s] = par_jour.get(date_s, 0) + nb
+        if etage: par_etage[etage] += nb
+        no_shows += ns
+    par_heure = {f"{h}h": 0 for h in range(8, 21)}
+    for h, nb in rows_heure:
+        if f"{h}h" in par_heure: par_heure[f"{h}h"] += nb
+    return {"par_jour": par_jour, "par_etage": par_etage, "par_heure": par_heure, "no_shows": no_shows}
+
+@retry_si_verrou
+def manage_group_action(email, salle, date_obj, heure_debut, action_type):
+    # Lecture du groupe et écriture sous le même verrou d'écriture : deux "Rejoindre"
+    # simultanés ne peuvent pas dépasser MIN_GROUPE à partir du même état.
+    conn = get_conn()
+    conn.isolation_level = None
+    c = conn.cursor()
+    date_s = date_obj.strftime("%Y-%m-%d")
+    h_str = heure_debut.strftime("%H:%M")
+    try:
+        c.execute("BEGIN IMMEDIATE")
+    
+        c.execute("SELECT id, user_email, participants, start_time, end_time FROM reservations WHERE salle=? AND date_str=? AND start_time <= ? AND end_time > ?", 
+                  (salle, date_s, h_str, h_str))
+        existing = c.fetchone()
+    
+        status, msg = "ok", ""
+        # seules les écritures qui touchent des lignes font monter les versions
+        modifie = False
+    
+        if existing:
+            res_id, creator, _, debut, fin = existing
+            participants = _get_participants(c, res_id)
+        
+            if action_type == "leave":
+                if creator == email:
+                    if participants:
+                        new_boss = participants.pop(0)
+                        c.execute("DELETE FROM reservation_members WHERE reservation_id=? AND user_email=?", (res_id, email))
+                        modifie = c.rowcount > 0
+                        c.execute("UPDATE reservation_members SET role='createur', position=0 WHERE reservation_id=? AND user_email=?", (res_id, new_boss))
+                        c.execute("UPDATE reservations SET user_email=? WHERE id=?", (new_boss, res_id))
+                        _maj_colonnes_membres(c, res_id)
+                        msg = f"Vous avez quitté. {new_boss} est responsable."
+                    else:
+                        c.execute("DELETE FROM reservations WHERE id=?", (res_id,))
+                        modifie = c.rowcount > 0
+                        msg = "Réservation annulée (Groupe vide)."
+                elif email in participants:
+                    c.execute("DELETE FROM reservation_members WHERE reservation_id=? AND user_email=?", (res_id, email))
+                    modifie = c.rowcount > 0
+                    _maj_colonnes_membres(c, res_id)
+                    msg = "Vous avez quitté le groupe."
+        
+            elif action_type == "cancel":
+                 c.execute("DELETE FROM reservations WHERE id=?", (res_id,))
+                 modifie = c.rowcount > 0
+                 msg = "Réservation annulée."
+
+            elif action_type == "join":
+                ok_q, _ = verifier_quota_hebdo(email, date_obj)
+                if not ok_q:
+                    status, msg = "error", "Quota hebdo dépassé !"
+                elif email not in participants and email != creator and 1 + len(participants) >= MIN_GROUPE:
+                    status, msg = "error", "Groupe complet."
+                else:
+                    if email not in participants and email != creator:
+                        participants.append(email)
+                        c.execute("INSERT INTO reservation_members (reservation_id, user_email, role, position, date_str) "
+                                  "SELECT ?, ?, 'participant', COALESCE(MAX(position), 0) + 1, ? FROM reservation_members WHERE reservation_id=?",
+                                  (res_id, email, date_s, res_id))
+                        modifie = c.rowcount > 0
+                        _maj_colonnes_membres(c, res_id)
+                        msg = f"Groupe rejoint ({1+len(participants)}/{MIN_GROUPE})."
+                    else:
+                        msg = "Vous êtes déjà dans le groupe."
+        else:
+            status, msg = "error", "Réservation introuvable."
+                
+        if modifie: _noter_changements(c, [(date_s, salle, h) for h in _heures_occupees(debut, fin)], "groupe")
+        c.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction: c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return status, msg
+
+@retry_si_verrou
+def manage_clic_salle(email, salle, date_obj, heure_debut, heure_fin, is_forced_groupe):
+    # Vérification et réservation dans la même transaction d'écriture : sous une rafale, le
+    # premier à prendre le verrou gagne, les suivants tombent sur la clé de reservation_slots.
+    # Les "database is locked" résiduels sont rejoués par retry_si_verrou (DB_MAX_RETRY essais).
+    date_s = date_obj.strftime("%Y-%m-%d")
+    h_str, fin_str = heure_debut.strftime("%H:%M"), heure_fin.strftime("%H:%M")
+    conn = get_conn()
+    conn.isolation_level = None
+    c = conn.cursor()
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        c.execute(SQL_CRENEAU_BLOQUE, (salle, date_s, heure_debut.hour))
+        if c.fetchone():
+            c.execute("ROLLBACK")
+            return "error", "⛔ Salle bloquée par l'admin."
+        c.execute("INSERT INTO reservations (user_email, salle, date_str, start_time, end_time, participants, confirmed_list) VALUES (?, ?, ?, ?, ?, ?, '')",
+                  (email, salle, date_s, h_str, fin_str, ""))
+        res_id = c.lastrowid
+        try:
+            c.executemany("INSERT INTO reservation_slots VALUES (?, ?, ?, ?)",
+                          [(salle, date_s, h, res_id) for h in _heures_occupees(h_str, fin_str)])
+        except sqlite3.IntegrityError:
+            c.execute("ROLLBACK")
+            return "error", "⚠️ Créneau déjà réservé par quelqu'un d'autre."
+        c.execute("INSERT INTO reservation_members (reservation_id, user_email, role, position, date_str) VALUES (?, ?, 'createur', 0, ?)",
+                  (res_id, email, date_s))
+        _noter_changements(c, [(date_s, salle, h) for h in _heures_occupees(h_str, fin_str)], "reservation")
+        c.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction: c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    msg = "Groupe initié (1/5) !" if is_forced_groupe else "Salle réservée (Solo)."
+    return "ok", msg
+
+def get_db_reservations(date_obj):
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_RESERVATIONS_JOUR, (date_obj.strftime("%Y-%m-%d"),))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def get_mes_reservations_futures(email):
+    conn = get_conn()
+    c = conn.cursor()
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    c.execute(SQL_MES_RESERVATIONS, (email, today))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def charger_liens():
+    if not os.path.exists(FICHIER_LIENS): return []
+    with open(FICHIER_LIENS, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip().startswith("http")]
+
+def nettoyer_nom_salle(nom_brut):
+    if "(" in nom_brut: return nom_brut.split("(")[0].strip()
+    return nom_brut
+
+# --- HTTP (ADE) ---
+_http_session = None
+_http_lock = threading.Lock()
+
+def get_http_session():
+    # Une seule session keep-alive partagée par tous les threads : les flux ADE
+    # sont tous sur mon-edt.u-pec.fr, on réutilise donc les mêmes connexions.
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=ADE_MAX_WORKERS)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _http_session = s
+    return _http_session
+
+def fetch_flux_ade(url, etat=None):
+    # etat = (etag, last_modified, digest) du dernier passage : on envoie un GET
+    # conditionnel, et si le serveur ignore les validateurs on compare le hash.
+    # Le corps part dans un fichier temporaire au fil du hash : res["fichier"] n'est
+    # renseigné que si le flux a changé, à relire avec chunks_fichier() puis à fermer.
+    etag, last_modified, digest = etat or (None, None, None)
+    headers = {}
+    if etag: headers["If-None-Match"] = etag
+    if last_modified: headers["If-Modified-Since"] = last_modified
+    t0 = time.perf_counter()
+    res = {"url": url, "status": None, "fichier": None, "duree_ms": 0.0, "resultat": "erreur",
+           "etag": etag, "last_modified": last_modified, "digest": digest}
+    fichier = None
+    try:
+        # stream=True : la connexion ne revient au pool qu'une fois le corps lu jusqu'au bout,
+        # sinon la fermeture de la réponse la jette ; un 304 ou une page d'erreur sont donc lus aussi
+        with get_http_session().get(url, timeout=ADE_FETCH_TIMEOUT, headers=headers, stream=True) as r:
+            res["status"] = r.status_code
+            if r.status_code != 200:
+                r.content
+                if r.status_code == 304: res["resultat"] = "304"
+            else:
+                res["etag"] = r.headers.get("ETag")
+                res["last_modified"] = r.headers.get("Last-Modified")
+                h, fichier = hashlib.sha256(), tempfile.TemporaryFile()
+                for chunk in r.iter_content(chunk_size=CHUNK_ICAL):
+                    h.update(chunk)
+                    fichier.write(chunk)
+                if h.hexdigest() == digest:
+                    res["resultat"] = "inchange"
+                else:
+                    res["resultat"] = "maj"
+                    res["digest"] = h.hexdigest()
+                    fichier.seek(0)
+                    res["fichier"], fichier = fichier, None
+    except Exception as e:
+        res["status"] = type(e).__name__
+    finally:
+        if fichier is not None: fichier.close()
+    res["duree_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    enregistrer_mesure("http", f"{urllib.parse.urlsplit(url).netloc} [{res['resultat']}]", res["duree_ms"])
+    return res
+
+def chunks_fichier(fichier):
+    return iter(lambda: fichier.read(CHUNK_ICAL), b"")
+
+def fermer_flux(resultats):
+    for f in resultats:
+        if f["fichier"] is not None: f["fichier"].close()
+
+def fetch_tous_flux_ade(liens, etats=None):
+    if not liens: return []
+    etats = etats or {}
+    with ThreadPoolExecutor(max_workers=min(ADE_MAX_WORKERS, len(liens))) as pool:
+        return list(pool.map(lambda u: fetch_flux_ade(u, etats.get(u)), liens))
+
+def get_stats_refresh_ade():
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT value FROM metadata WHERE key='ade_refresh_stats'")
+    res = c.fetchone()
+    conn.close()
+    return json.loads(res[0]) if res else None
+
+def _creer_table_cache_ade(c, nom):
+    c.execute(f"CREATE TABLE {nom} (salle TEXT, debut TEXT, fin TEXT, source TEXT)")
+
+def _lignes_cache_ade(flux):
+    flux["fichier"].seek(0)
+    for ev in iter_evenements(chunks_fichier(flux["fichier"])):
+        for salle in ev["salles"]:
+            if "CC P" in salle:
+                yield (nettoyer_nom_salle(salle), ev["debut"].isoformat(), ev["fin"].isoformat(), flux["url"])
+
+JOURNAL_ADE_MAX = 5000
+
+def _changements_cache_ade(c):
+    # Cours ajoutés ou retirés entre cache_ade et cache_ade_staging -> (jour, salle, heure).
+    # Au-delà de JOURNAL_ADE_MAX cours modifiés (nouveau semestre), on note des journées entières.
+    c.execute("""SELECT salle, debut, fin FROM (SELECT salle, debut, fin FROM cache_ade_staging EXCEPT SELECT salle, debut, fin FROM cache_ade)
+                 UNION ALL
+                 SELECT salle, debut, fin FROM (SELECT salle, debut, fin FROM cache_ade EXCEPT SELECT salle, debut, fin FROM cache_ade_staging)""")
+    diff = c.fetchall()
+    if len(diff) > JOURNAL_ADE_MAX: return [(j, None, None) for j in sorted({r[1][:10] for r in diff})]
+    return [(debut[:10], salle, h) for salle, debut, fin in diff
+            for h in _heures_occupees(debut[11:16], fin[11:16] if fin[:10] == debut[:10] else "23:59")]
+
+def update_cache_ade_si_necessaire(force=False):
+    conn = get_conn()
+    conn.isolation_level = None
+    c = conn.cursor()
+    c.execute("SELECT value FROM metadata WHERE key='last_update'")
+    res = c.fetchone()
+    now_ts = time.time()
+    stats = None
+    if force or not res or (now_ts - float(res[0]) > CACHE_TIMEOUT):
+        t0 = time.perf_counter()
+        liens = charger_liens()
+        c.execute("SELECT url, etag, last_modified, digest FROM ade_feeds")
+        etats = {r[0]: r[1:] for r in c.fetchall()}
+        resultats = fetch_tous_flux_ade(liens, etats)
+        t_fetch = time.perf_counter()
+        nb_lignes = 0
+        a_changer = [f for f in resultats if f["fichier"] is not None]
+        try:
+            c.execute("SELECT COUNT(*) FROM cache_ade WHERE source IS NULL OR source NOT IN (%s)" % ",".join("?" * len(liens)), liens)
+            orphelins = c.fetchone()[0]
+            if a_changer:
+                # Parsing hors du verrou d'écriture : les lignes des flux modifiés vont d'abord
+                # dans une table TEMP de la connexion, que les réservations ne voient pas.
+                c.execute("DROP TABLE IF EXISTS temp.cache_ade_flux")
+                c.execute("CREATE TEMP TABLE cache_ade_flux (salle TEXT, debut TEXT, fin TEXT, source TEXT)")
+                c.execute("BEGIN")
+                for flux in a_changer:
+                    try:
+                        c.executemany("INSERT INTO temp.cache_ade_flux VALUES (?, ?, ?, ?)", _lignes_cache_ade(flux))
+                        nb_lignes += c.rowcount
+                    except Exception:
+                        # Flux illisible : on garde ses anciennes lignes et son ancien digest
+                        c.execute("DELETE FROM temp.cache_ade_flux WHERE source=?", (flux["url"],))
+                        flux["resultat"] = "erreur"
+                c.execute("COMMIT")
+                fermer_flux(resultats)
+            t_verrou = time.perf_counter()
+            c.execute("BEGIN IMMEDIATE")
+            if a_changer or orphelins:
+                # Nouveau cache construit à côté puis échangé d'un bloc : un lecteur voit
+                # soit tout l'ancien cache, soit tout le nouveau, jamais une table vide.
+                c.execute("DROP TABLE IF EXISTS cache_ade_staging")
+                _creer_table_cache_ade(c, "cache_ade_staging")
+                lus = {f["url"] for f in a_changer if f["resultat"] != "erreur"}
+                gardes = [f["url"] for f in resultats if f["url"] not in lus]
+                c.execute("INSERT INTO cache_ade_staging SELECT salle, debut, fin, source FROM cache_ade WHERE source IN (%s)" % ",".join("?" * len(gardes)), gardes)
+                if a_changer: c.execute("INSERT INTO cache_ade_staging SELECT salle, debut, fin, source FROM temp.cache_ade_flux")
+                _noter_changements(c, _changements_cache_ade(c), "ade")
+                c.execute("DROP TABLE cache_ade")
+                c.execute("ALTER TABLE cache_ade_staging RENAME TO cache_ade")
+                _indexer_cache_ade(c)
+                c.execute("SELECT DISTINCT salle FROM cache_ade WHERE salle NOT IN (SELECT nom FROM salles)")
+                _enregistrer_salles(c, [r[0] for r in c.fetchall() if r[0]], "ade")
+            c.execute("DELETE FROM ade_feeds WHERE url NOT IN (%s)" % ",".join("?" * len(liens)), liens)
+            c.executemany("REPLACE INTO ade_feeds (url, etag, last_modified, digest) VALUES (?, ?, ?, ?)",
+                          [(f["url"], f["etag"], f["last_modified"], f["digest"]) for f in resultats if f["resultat"] != "erreur"])
+            t_ingest = time.perf_counter() - t_fetch
+            stats = {
+                "date": now_ts,
+                "total_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "fetch_ms": round((t_fetch - t0) * 1000, 1),
+                "ingestion_ms": round(t_ingest * 1000, 1),
+                "verrou_ms": round((time.perf_counter() - t_verrou) * 1000, 1),
+                "lignes": nb_lignes,
+                "lignes_par_s": round(nb_lignes / t_ingest) if nb_lignes and t_ingest > 0 else 0,
+                "flux": [{"url": f["url"], "status": f["status"], "resultat": f["resultat"], "duree_ms": f["duree_ms"]} for f in resultats],
+            }
+            c.execute("REPLACE INTO metadata VALUES ('last_update', ?)", (str(now_ts),))
+            c.execute("REPLACE INTO metadata VALUES ('ade_refresh_stats', ?)", (json.dumps(stats),))
+            c.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction: c.execute("ROLLBACK")
+            raise
+        finally:
+            fermer_flux(resultats)
+            if a_changer: c.execute("DROP TABLE IF EXISTS temp.cache_ade_flux")
+            conn.close()
+        return stats
+    conn.close()
+    return stats
+
+# --- TÂCHES DE FOND ---
+# Le refresh ADE et le balayage des no-shows ne tournent plus pendant l'affichage d'une
+# page : chaque tâche a son thread dans le process. Un seul refresh à la fois
+# (single-flight) ; pendant ce temps les lectures de cache_ade voient l'ancien contenu
+# jusqu'au commit.
+REFRESH_TICK = 60
+NO_SHOW_TICK = 60
+_refresh_lock = threading.Lock()
+_taches = {}
+_taches_lock = threading.Lock()
+
+def rafraichir_cache_ade(force=False):
+    # Renvoie None sans attendre si un refresh est déjà en cours.
+    if not _refresh_lock.acquire(blocking=False): return None
+    try: return update_cache_ade_si_necessaire(force)
+    finally: _refresh_lock.release()
+
+def refresh_ade_en_cours():
+    return _refresh_lock.locked()
+
+def _boucle_tache(fn, periode):
+    # Une exception ne tue pas la boucle mais laisse une trace : pile sur stderr et
+    # mesure "tache" / "<nom> [erreur]" dans l'onglet Performances.
+    nom = threading.current_thread().name
+    while True:
+        t0 = time.perf_counter()
+        try:
+            fn()
+            enregistrer_mesure("tache", nom, (time.perf_counter() - t0) * 1000)
+        except Exception:
+            enregistrer_mesure("tache", f"{nom} [erreur]", (time.perf_counter() - t0) * 1000)
+            print(f"[{nom}] échec de {fn.__name__} :", file=sys.stderr)
+            traceback.print_exc()
+        time.sleep(periode)
+
+def demarrer_taches_fond():
+    with _taches_lock:
+        for nom, fn, periode in [("refresh-ade", rafraichir_cache_ade, REFRESH_TICK),
+                                 ("no-show", clean_no_show_reservations, NO_SHOW_TICK),
+                                 ("occupation", consolider_occupation, CONSOLIDATION_TICK),
+                                 ("archive", archiver_reservations, ARCHIVE_TICK)]:
+            t = _taches.get(nom)
+            if t is None or not t.is_alive():
+                _taches[nom] = threading.Thread(target=_boucle_tache, args=(fn, periode), name=nom, daemon=True)
+                _taches[nom].start()
+    return _taches
+
+def get_planning_sql(date_choisie):
+    conn = get_conn()
+    c = conn.cursor()
+    d_start = datetime.datetime.combine(date_choisie, datetime.time(0,0))
+    d_end = datetime.datetime.combine(date_choisie, datetime.time(23,59))
+    c.execute(SQL_PLANNING_JOUR, (d_start.isoformat(), d_end.isoformat()))
+    rows = c.fetchall()
+    conn.close()
+    planning = []
+    for r in rows:
+        try: d = datetime.datetime.fromisoformat(r[1])
+        except: d = datetime.datetime.now()
+        try: f = datetime.datetime.fromisoformat(r[2])
+        except: f = datetime.datetime.now()
+        planning.append({"salle": r[0], "debut": d, "fin": f})
+    return planning
+
+def analyse_salle_intelligente(salle, planning_jour, resas_db, time_choisi, my_email, date_obj):
+    restriction = get_restriction(salle, date_obj, time_choisi.hour)
+    if restriction == "DAY_BLOCK": return "admin_lock", datetime.time(20,0), "⛔ Fermée (Journée)", False
+    if restriction == "BLOCK": return "admin_lock", datetime.time(20,0), "⛔ Fermée (Créneau)", False
+    cours_now = [c for c in planning_jour if c['salle'] == salle and c['debut'].time() <= time_choisi < c['fin'].time()]
+    if cours_now: return "rouge", cours_now[0]['fin'].time(), "Cours", False
+    for r in resas_db:
+        r_start = datetime.datetime.strptime(r[1], "%H:%M").time()
+        r_end = datetime.datetime.strptime(r[2], "%H:%M").time()
+        if r[0] == salle and r_start <= time_choisi < r_end:
+            creator = r[3]
+            parts = r[4].split(",") if r[4] else []
+            nb_pers = 1 + len(parts)
+            if creator == my_email:
+                return "orange_moi", r_end, "Annuler", False
+            elif my_email in parts:
+                return "orange_moi", r_end, f"Quitter ({nb_pers}/{MIN_GROUPE})", False
+            if nb_pers < MIN_GROUPE: return "bleu", r_end, f"Rejoindre ({nb_pers}/{MIN_GROUPE})", True
+            return "orange", r_end, "Complet", False
+    is_group_forced = (restriction == "GROUP")
+    prochains = [c for c in planning_jour if c['salle'] == salle and c['debut'].time() > time_choisi]
+    prochains.sort(key=lambda x: x['debut'])
+    limit = prochains[0]['debut'].time() if prochains else datetime.time(20, 0)
+    return "vert", limit, "Libre", is_group_forced
+
+# --- MOTEUR DE DISPONIBILITÉ ---
+# Index d'une journée construit en 3 requêtes (cours, réservations, restrictions), puis
+# interrogé pour toutes les salles d'un étage sans autre accès à la base. Les réponses de
+# analyser_salles() sont identiques à celles de analyse_salle_intelligente().
+FIN_JOURNEE = datetime.time(20, 0)
+
+def get_restrictions_jour(date_obj):
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_RESTRICTIONS_JOUR, (date_obj.strftime("%Y-%m-%d"),))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def construire_index_jour(date_obj, planning_jour=None, resas_db=None):
+    if planning_jour is None: planning_jour = get_planning_sql(date_obj)
+    if resas_db is None: resas_db = get_db_reservations(date_obj)
+    cours, debuts = {}, {}
+    # (début, ordre dans le planning, fin) trié par début : bisect sur les débuts
+    for ordre, ev in enumerate(planning_jour):
+        cours.setdefault(ev['salle'], []).append((ev['debut'].time(), ordre, ev['fin'].time()))
+    for salle, lst in cours.items():
+        lst.sort()
+        debuts[salle] = [x[0] for x in lst]
+    resas = {}
+    for r in resas_db:
+        r_start = datetime.datetime.strptime(r[1], "%H:%M").time()
+        r_end = datetime.datetime.strptime(r[2], "%H:%M").time()
+        resas.setdefault(r[0], []).append((r_start, r_end, r[3], r[4].split(",") if r[4] else []))
+    restrictions = {}
+    for salle, hour, type_rest in get_restrictions_jour(date_obj):
+        restrictions.setdefault(salle, {}).setdefault(hour, type_rest)
+    return {"date": date_obj, "cours": cours, "debuts": debuts, "resas": resas, "restrictions": restrictions}
+
+def restriction_index(index, salle, hour):
+    # même règle que get_restriction() : la restriction "journée" (hour=-1) l'emporte
+    r = index["restrictions"].get(salle)
+    if not r: return None
+    return r.get(-1) or r.get(hour)
+
+def _cours_en_cours(index, salle, t):
+    lst = index["cours"].get(salle)
+    if not lst: return None
+    n = bisect.bisect_right(index["debuts"][salle], t)
+    candidats = [x for x in lst[:n] if t < x[2]]
+    # à chevauchement égal, le premier cours dans l'ordre du planning (comme avant)
+    return min(candidats, key=lambda x: x[1]) if candidats else None
+
+def _prochain_cours(index, salle, t):
+    debuts = index["debuts"].get(salle)
+    if not debuts: return None
+    n = bisect.bisect_right(debuts, t)
+    return debuts[n] if n < len(debuts) else None
+
+def _resa_en_cours(index, salle, t):
+    for r in index["resas"].get(salle, ()):
+        if r[0] <= t < r[1]: return r
+    return None
+
+def analyser_salle(index, salle, time_choisi, my_email):
+    restriction = restriction_index(index, salle, time_choisi.hour)
+    if restriction == "DAY_BLOCK": return "admin_lock", FIN_JOURNEE, "⛔ Fermée (Journée)", False
+    if restriction == "BLOCK": return "admin_lock", FIN_JOURNEE, "⛔ Fermée (Créneau)", False
+    cours = _cours_en_cours(index, salle, time_choisi)
+    if cours: return "rouge", cours[2], "Cours", False
+    r = _resa_en_cours(index, salle, time_choisi)
+    if r:
+        r_end, creator, parts = r[1], r[2], r[3]
+        nb_pers = 1 + len(parts)
+        if creator == my_email: return "orange_moi", r_end, "Annuler", False
+        elif my_email in parts: return "orange_moi", r_end, f"Quitter ({nb_pers}/{MIN_GROUPE})", False
+        if nb_pers < MIN_GROUPE: return "bleu", r_end, f"Rejoindre ({nb_pers}/{MIN_GROUPE})", True
+        return "orange", r_end, "Complet", False
+    limit = _prochain_cours(index, salle, time_choisi) or FIN_JOURNEE
+    return "vert", limit, "Libre", restriction == "GROUP"
+
+def analyser_salles(index, salles, time_choisi, my_email):
+    return {s: analyser_salle(index, s, time_choisi, my_email) for s in salles}
+
+def prochain_creneau_libre(index, salle, time_choisi):
+    # Premier instant >= time_choisi où la salle n'est ni en cours, ni réservée, ni bloquée.
+    t = time_choisi
+    while t < FIN_JOURNEE:
+        restriction = restriction_index(index, salle, t.hour)
+        if restriction == "DAY_BLOCK": return None
+        if restriction == "BLOCK":
+            t = datetime.time(t.hour + 1, 0)
+            continue
+        occupe = _cours_en_cours(index, salle, t)
+        fin = occupe[2] if occupe else None
+        r = _resa_en_cours(index, salle, t)
+        if r and (fin is None or r[1] > fin): fin = r[1]
+        if fin is None: return t
+        t = fin
+    return None
+
+def prochains_creneaux_libres(index, salles, time_choisi):
+    return {s: prochain_creneau_libre(index, s, time_choisi) for s in salles}
+
+# --- SNAPSHOTS PAR JOUR ---
+# Données d'une journée (cours, réservations, index de disponibilité, matrice d'occupation)
+# calculées une fois et partagées par toutes les sessions du process. Chaque entrée porte
+# la version du jour (versions_jour) avec laquelle elle a été construite ; les écritures
+# incrémentent 'data_version' et notent les jours, salles et heures qu'elles touchent dans
+# leur transaction (_noter_changements), y compris depuis un autre process, et l'entrée est
+# reconstruite à la lecture suivante. Une réservation pour demain ne jette pas aujourd'hui.
+SNAPSHOTS_MAX = 32
+SNAPSHOTS_VERROUS = 16
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+# verrous de construction en nombre fixe (clé hachée) : l'API accepte n'importe quelle date.
+# Non réentrants : une fonction construire() ne doit pas repasser par _cache_jour().
+_verrous_snapshot = [threading.Lock() for _ in range(SNAPSHOTS_VERROUS)]
+
+def _incrementer_version(c):
+    # dans la transaction d'écriture, juste avant le commit
+    c.execute("UPDATE metadata SET value = CAST(value AS INTEGER) + 1 WHERE key='data_version'")
+
+def _noter_changements(c, changements, source):
+    # changements = [(date_str, salle, heure)] ; chaque jour touché prend la nouvelle data_version,
+    # les versions par jour restent donc croissantes et comparables entre elles.
+    _incrementer_version(c)
+    changements = set(changements)
+    if not changements: return
+    c.execute("SELECT CAST(value AS INTEGER) FROM metadata WHERE key='data_version'")
+    version = c.fetchone()[0]
+    c.executemany("REPLACE INTO versions_jour VALUES (?, ?)", [(j, version) for j in {ch[0] for ch in changements}])
+    c.executemany("INSERT INTO journal_changements VALUES (?, ?, ?, ?, ?)", [(version,) + ch + (source,) for ch in changements])
+
+def get_version_donnees():
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_VERSION_DONNEES)
+    res = c.fetchone()
+    conn.close()
+    return int(res[0]) if res else 0
+
+def get_version_jour(date_obj):
+    # Entier qui ne fait que croître, changé par chaque écriture touchant ce jour
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_VERSION_JOUR, (date_obj.strftime("%Y-%m-%d"),))
+    res = c.fetchone()
+    conn.close()
+    return res[0] if res else 0
+
+def get_changements_depuis(date_obj, version):
+    # {"version": version du jour, "tout": True si le client doit tout recharger,
+    #  "salles": {salle: [heures] ou None pour toute la journée}} depuis `version`
+    date_s = date_obj.strftime("%Y-%m-%d")
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute(SQL_VERSION_JOUR, (date_s,))
+    res = c.fetchone()
+    actuelle = res[0] if res else 0
+    c.execute(SQL_CHANGEMENTS, (date_s, version))
+    lignes = c.fetchall()
+    conn.close()
+    if actuelle <= version: return {"version": actuelle, "tout": False, "salles": {}}
+    # journal purgé pour ce jour, ou changement sans salle précise
+    if not lignes or any(s is None for s, _ in lignes): return {"version": actuelle, "tout": True, "salles": {}}
+    salles = {}
+    for salle, hour in lignes:
+        if hour is None: salles[salle] = None
+        elif salles.get(salle, []) is not None: salles.setdefault(salle, []).append(hour)
+    return {"version": actuelle, "tout": False, "salles": {s: sorted(set(h)) if h is not None else None for s, h in sorted(salles.items())}}
+
+def _cache_jour(nom, date_obj, construire):
+    cle = (DB_FILE, nom, date_obj)
+    version = get_version_jour(date_obj)
+    with _snapshots_lock:
+        entree = _snapshots.get(cle)
+        if entree and entree[0] >= version: return entree[1]
+    # une seule construction par jour et par version, les autres sessions attendent
+    with _verrous_snapshot[hash(cle) % SNAPSHOTS_VERROUS]:
+        with _snapshots_lock:
+            entree = _snapshots.get(cle)
+            # construite pendant l'attente avec une version au moins aussi récente
+            if entree and entree[0] >= version: return entree[1]
+        # version lue avant la construction : une écriture concurrente la rendra
+        # périmée et provoquera une reconstruction, jamais l'inverse
+        valeur = construire(date_obj)
+        with _snapshots_lock:
+            _snapshots.pop(cle, None)
+            _snapshots[cle] = (version, valeur)
+            if len(_snapshots) > SNAPSHOTS_MAX: _snapshots.pop(next(iter(_snapshots)))
+    return valeur
+
+def construire_snapshot_jour(date_obj):
+    planning = get_planning_sql(date_obj)
+    resas = get_db_reservations(date_obj)
+    return {"date": date_obj, "planning": planning, "resas": resas, "index": construire_index_jour(date_obj, planning, resas)}
+
+def get_snapshot_jour(date_obj):
+    return _cache_jour("jour", date_obj, construire_snapshot_jour)
+
+def get_index_jour(date_obj):
+    return get_snapshot_jour(date_obj)["index"]
+
+# --- RECHERCHE CAMPUS ---
+def fenetre_libre(index, salle, t):
+    # Fin de la plage libre qui commence à t, None si la salle n'est pas libre à t.
+    # Contrairement à analyser_salle(), la plage s'arrête aussi à la prochaine réservation
+    # ou à la prochaine heure bloquée.
+    if t >= FIN_JOURNEE: return None
+    restriction = restriction_index(index, salle, t.hour)
+    if restriction in ("BLOCK", "DAY_BLOCK"): return None
+    if _cours_en_cours(index, salle, t) or _resa_en_cours(index, salle, t): return None
+    fin = _prochain_cours(index, salle, t) or FIN_JOURNEE
+    for r in index["resas"].get(salle, ()):
+        if t < r[0] < fin: fin = r[0]
+    for h, type_rest in index["restrictions"].get(salle, {}).items():
+        if type_rest == "BLOCK" and t.hour < h and datetime.time(h, 0) < fin: fin = datetime.time(h, 0)
+    return min(fin, FIN_JOURNEE)
+
+def rechercher_salles_libres(date_obj, heure, duree_min, equipements=()):
+    # Salles de tous les étages libres au moins duree_min minutes à partir de heure et
+    # équipées de toutes les icônes demandées, la plus longue plage libre en premier.
+    index = get_index_jour(date_obj)
+    equip = get_equipements()
+    debut_min = heure.hour * 60 + heure.minute
+    resultats = []
+    for salle, etage in get_salles_actives():
+        icones = equip.get(salle, [])
+        if any(e not in icones for e in equipements): continue
+        fin = fenetre_libre(index, salle, heure)
+        if fin is None: continue
+        minutes = fin.hour * 60 + fin.minute - debut_min
+        if minutes < duree_min: continue
+        resultats.append({"salle": salle, "etage": etage, "fin": fin, "minutes": minutes, "icones": icones,
+                          "groupe": restriction_index(index, salle, heure.hour) == "GROUP"})
+    resultats.sort(key=lambda r: (-r["minutes"], r["salle"]))
+    return resultats
+
+# --- VUE SEMAINE ---
+# Occupation salle x heure (créneaux 8h-9h ... 19h-20h) calculée en une passe NumPy :
+# chaque cours / réservation est comparé à tous les créneaux d'un coup, puis replié
+# par salle. True = occupée (cours, réservation ou blocage admin).
+HEURES_GRILLE = np.arange(8, 20)
+
+def _minutes_iso(s):
+    # "2026-01-05T08:30:00" ou "08:30" -> 510
+    s = s[11:16] if "T" in s else s[:5]
+    return int(s[:2]) * 60 + int(s[3:5])
+
+def construire_matrice_occupation(date_obj):
+    date_s = date_obj.strftime("%Y-%m-%d")
+    conn = get_conn()
+    c = conn.cursor()
+    c.execute("SELECT salle, debut, fin FROM cache_ade WHERE debut >= ? AND debut <= ?", (date_s + "T00:00:00", date_s + "T23:59:00"))
+    intervalles = c.fetchall()
+    c.execute("SELECT salle, start_time, end_time FROM reservations WHERE date_str=?", (date_s,))
+    intervalles += c.fetchall()
+    c.execute("SELECT salle, hour, type FROM restrictions WHERE date_str=? AND type IN ('BLOCK', 'DAY_BLOCK')", (date_s,))
+    blocages = c.fetchall()
+    conn.close()
+    salles = sorted({r[0] for r in intervalles} | {r[0] for r in blocages})
+    pos = {s: i for i, s in enumerate(salles)}
+    occupee = np.zeros((len(salles), len(HEURES_GRILLE)), dtype=bool)
+    if intervalles:
+        lignes = np.array([pos[r[0]] for r in intervalles])
+        debuts = np.array([_minutes_iso(r[1]) for r in intervalles])
+        fins = np.array([_minutes_iso(r[2]) for r in intervalles])
+        creneaux = HEURES_GRILLE * 60
+        chevauche = (debuts[:, None] < creneaux + 60) & (fins[:, None] > creneaux)
+        np.logical_or.at(occupee, lignes, chevauche)
+    for salle, hour, type_rest in blocages:
+        if type_rest == "DAY_BLOCK": occupee[pos[salle], :] = True
+        elif 8 <= hour < 20: occupee[pos[salle], hour - 8] = True
+    return salles, occupee
+
+def get_matrice_occupation(date_obj):
+    return _cache_jour("occupation", date_obj, construire_matrice_occupation)
+
+def get_occupation_semaine(jours, etage=None):
+    # (salles, matrice salles x jours x heures) alignée sur l'union des salles de la semaine
+    par_jour = [get_matrice_occupation(d) for d in jours]
+    if etage: salles = sorted(s for lst in get_salles_etage(etage).values() for s in lst)
+    else: salles = sorted({s for lst, _ in par_jour for s in lst})
+    pos = {s: i for i, s in enumerate(salles)}
+    semaine = np.zeros((len(salles), len(jours), len(HEURES_GRILLE)), dtype=bool)
+    for j, (lst, occupee) in enumerate(par_jour):
+        idx = [(pos[s], i) for i, s in enumerate(lst) if s in pos]
+        if idx:
+            dst, src = zip(*idx)
+            semaine[list(dst), j] = occupee[list(src)]
+    return salles, semaine
+
+# --- INSTRUMENTATION DES FONCTIONS ---
+# Dernier bloc du module : chaque fonction publique est remplacée par sa version mesurée,
+# appels internes compris. Les petites fonctions appelées par salle ou par événement
+# resteraient dominées par le coût de la mesure : on les laisse de côté, comme la plomberie
+# (emprunt au pool, session HTTP, lecture des fichiers de flux) appelée par toutes les autres.
+_NON_MESUREES = {"retry_si_verrou", "reset_compteurs_db", "get_compteurs_db", "enregistrer_mesure", "chrono", "mesurer",
+                 "get_mesures", "get_requetes_lentes", "set_seuil_requete_lente", "reset_mesures", "exporter_mesures",
+                 "format_date_joli", "format_icones", "normaliser_url_ical", "nettoyer_nom_salle", "classer_salle",
+                 "etage_de_salle", "restriction_index", "analyser_salle", "prochain_creneau_libre", "fenetre_libre",
+                 "get_conn", "get_http_session", "chunks_fichier", "fermer_flux"}
+for _nom, _fn in list(globals().items()):
+    if callable(_fn) and getattr(_fn, "__module__", None) == __name__ and not _nom.startswith("_") \
+            and not isinstance(_fn, type) and _nom not in _NON_MESUREES:
+        globals()[_nom] = mesurer()(_fn)
@@ -0,0 +1,88 @@
+"""Débit de l'API JSON (api.py) sur un campus synthétique, avec et sans If-None-Match.
+
+Usage : python bench/bench_api.py [nb_clients] [requetes_par_client]
+Chaque client garde sa connexion keep-alive et interroge en boucle les quatre étages,
+comme un écran de couloir. Un dernier passage mesure le premier appel après une écriture
+(version changée, corps recalculé).
+"""
+import os
+import sys
+import time
+import random
+import datetime
+import tempfile
+import threading
+import http.client
+
+import campus
+import backend
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import api
+
+NB_CLIENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+REQUETES = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+
+def client(port, chemins, conditionnel, durees):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    etags = {}
+    for i in range(REQUETES):
+        chemin = chemins[i % len(chemins)]
+        entetes = {"If-None-Match": etags[chemin]} if conditionnel and chemin in etags else {}
+        t0 = time.perf_counter()
+        conn.request("GET", chemin, headers=entetes)
+        r = conn.getresponse()
+        r.read()
+        durees.append((time.perf_counter() - t0) * 1000)
+        if r.status not in (200, 304): raise RuntimeError(f"{chemin} -> {r.status}")
+        etags[chemin] = r.getheader("ETag")
+    conn.close()
+
+
+def passe(nom, port, chemins, conditionnel):
+    durees = []
+    threads = [threading.Thread(target=client, args=(port, chemins, conditionnel, durees)) for _ in range(NB_CLIENTS)]
+    t0 = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    duree = time.perf_counter() - t0
+    durees.sort()
+    print(f"  {nom:<28} {len(durees) / duree:8.0f} req/s   p50 {durees[len(durees) // 2]:6.2f} ms   p99 {durees[int(len(durees) * 0.99)]:6.2f} ms")
+
+
+def main():
+    rng = random.Random(1)
+    backend.MESURES_ACTIVES = False
+    jour = datetime.date.today()
+    salles = campus.salles_campus(40)
+    flux, _ = campus.flux_campus(salles, [jour], rng, 4)
+    stub, liens = campus.demarrer_stub(flux)
+    campus.preparer_base(tempfile.mkdtemp(), liens)
+    backend.update_cache_ade_si_necessaire(force=True)
+    stub.shutdown()
+    campus.peupler(salles, [jour], rng, 200, 300, 20)
+
+    srv = api.demarrer_api(0, "127.0.0.1")
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    port = srv.server_port
+    chemins = [f"/etages/{e}?date={jour}&heure=10:00" for e in campus.ETAGES]
+    print(f"{len(salles)} salles, {NB_CLIENTS} clients x {REQUETES} requêtes")
+    passe("200 (corps en cache)", port, chemins, False)
+    passe("304 (If-None-Match)", port, chemins, True)
+
+    durees = []
+    for e in campus.ETAGES:
+        backend.set_restriction(rng.choice(salles), jour, 10, "BLOCK")
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        t0 = time.perf_counter()
+        conn.request("GET", f"/etages/{e}?date={jour}&heure=10:00")
+        conn.getresponse().read()
+        durees.append((time.perf_counter() - t0) * 1000)
+        conn.close()
+    print(f"  {'après écriture (recalcul)':<28} {'':>8}           p50 {sorted(durees)[len(durees) // 2]:6.2f} ms")
+    srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Temps serveur et octets envoyés au navigateur par interaction (clic dans la grille).
+
+Usage : python bench/bench_fragments.py [chemin_app.py] [nb_clics]
+Rejoue via streamlit.testing les clics "Rejoindre"/"Quitter" de la grille étudiant et
+"💻" des contrôles admin. Quand le bouton est dans un st.fragment, le clic est envoyé
+comme le fait le navigateur (rerun limité au fragment) ; sinon c'est un rerun complet.
+Lancer sur une version sans fragments (git worktree) pour comparer.
+Le week-end, "aujourd'hui" est avancé au lundi : la grille ne réserve que le jour même.
+"""
+import os
+import sys
+import time
+import datetime
+import tempfile
+import statistics
+
+APP = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app.py")
+NB_CLICS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+os.chdir(tempfile.mkdtemp())
+sys.path.insert(0, os.path.dirname(APP))
+
+
+_date_reelle = datetime.date
+class JourOuvre(_date_reelle):
+    @classmethod
+    def today(cls):
+        d = _date_reelle.today()
+        while d.weekday() > 4: d += datetime.timedelta(days=1)
+        return cls(d.year, d.month, d.day)
+datetime.date = JourOuvre
+
+import backend
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+_octets = [0]
+_fragments = {}  # id du widget -> id du fragment qui l'a dessiné
+_fragment_clic = [None]
+
+_enqueue = ForwardMsgQueue.enqueue
+def enqueue(self, msg):
+    _octets[0] += msg.ByteSize()
+    if msg.HasField("delta") and msg.delta.HasField("new_element"):
+        el = msg.delta.new_element
+        champ = el.WhichOneof("type")
+        wid = getattr(getattr(el, champ), "id", None) if champ else None
+        if wid: _fragments[wid] = msg.delta.fragment_id
+    return _enqueue(self, msg)
+ForwardMsgQueue.enqueue = enqueue
+
+_request_rerun = local_script_runner.LocalScriptRunner.request_rerun
+def request_rerun(self, rerun_data):
+    # Le navigateur envoie l'id du fragment avec le clic. Le runner de test démarre avec
+    # une demande de rerun complet qui l'emporterait : on la remplace.
+    if not _fragment_clic[0]: return _request_rerun(self, rerun_data)
+    self._requests._rerun_data = RerunData(widget_states=rerun_data.widget_states, query_string=rerun_data.query_string,
+                                           page_script_hash=rerun_data.page_script_hash, fragment_id_queue=[_fragment_clic[0]])
+    return True
+local_script_runner.LocalScriptRunner.request_rerun = request_rerun
+
+
+def peupler():
+    backend.init_db()
+    jour = datetime.date.today()
+    conn = backend.get_conn()
+    c = conn.cursor()
+    salles = [f"CC P1 {'1' if i % 2 else '0'}{i:02d}" for i in range(40)]
+    backend._enregistrer_salles(c, salles, "ade")
+    for salle in salles:
+        for h in (8, 14, 16):
+            d = datetime.datetime.combine(jour, datetime.time(h))
+            c.execute("INSERT INTO cache_ade (salle, debut, fin, source) VALUES (?, ?, ?, 'bench')", (salle, d.isoformat(), (d + datetime.timedelta(hours=2)).isoformat()))
+    conn.commit()
+    conn.close()
+    backend.manage_clic_salle("autre@u-pec.fr", "CC P1 000", jour, datetime.time(10, 0), datetime.time(12, 0), True)
+
+
+def cliquer(at, bouton):
+    _fragment_clic[0] = _fragments.get(bouton.id) or None
+    _octets[0] = 0
+    t0 = time.perf_counter()
+    bouton.click().run()
+    duree = (time.perf_counter() - t0) * 1000
+    _fragment_clic[0] = None
+    if at.exception: raise RuntimeError(at.exception[0].message)
+    return duree, _octets[0]
+
+
+def mesurer(nom, at, trouver_bouton):
+    durees, octets = [], []
+    for _ in range(NB_CLICS):
+        d, o = cliquer(at, trouver_bouton(at))
+        durees.append(d); octets.append(o)
+    scope = "fragment" if _fragments.get(trouver_bouton(at).id) else "page entière"
+    print(f"  {nom:<28} {statistics.median(durees):7.1f} ms  {statistics.median(octets) / 1024:7.1f} Ko  ({scope})")
+
+
+def main():
+    peupler()
+    # pas de balayage no-show : la réservation de 10h serait déjà "passée" le soir
+    backend.demarrer_taches_fond = lambda: None
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    ss = at.session_state
+    ss.logged_in = True; ss.username = "bench"; ss.email = "bench@u-pec.fr"; ss.is_admin = False; ss.ade_url = ""
+    ss.page = "detail_etage"; ss.etage_choisi = "P1"; ss.expanded_grp = "Niveau 0"
+    at.run()
+    at.sidebar.radio[0].set_value("🏢 Réserver une Salle").run()
+    at.slider[0].set_value(10).run()
+    print(f"{APP} — médiane sur {NB_CLICS} clics")
+    mesurer("étudiant rejoindre/quitter", at, lambda at: at.button(key="CC P1 000"))
+    ss.is_admin = True
+    at.run()
+    at.sidebar.radio[0].set_value("🏢 Réserver une Salle").run()
+    mesurer("admin équipement 💻", at, lambda at: at.button(key="pc_CC P1 000"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Micro-benchmark : téléchargement + parseur iCal en flux vs ancien r.text + split.
+
+Usage : python bench/bench_ical.py [nb_evenements]
+Le flux est servi en local par campus.py ; les deux chemins le téléchargent réellement,
+le pic mémoire compte donc le corps de la réponse.
+"""
+import sys
+import time
+import datetime
+import tracemalloc
+
+import campus
+import backend
+from ical_parser import iter_evenements
+
+NB_EVENEMENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 12000
+
+
+def generer_flux(nb):
+    # Flux du type mon-edt : heures UTC, lignes pliées à 75 octets, virgules échappées.
+    lignes = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//ADE/version 6.0"]
+    jour0 = datetime.date(2026, 1, 5)
+    for i in range(nb):
+        jour = jour0 + datetime.timedelta(days=(i // 40) % 120)
+        h = 7 + i % 10
+        desc = f"DESCRIPTION:\\n\\nL3 Informatique groupe {i % 12}\\nEnseignant {i % 97}\\n(Exporté le:01/01/2026 10:00)\\n"
+        lignes += [
+            "BEGIN:VEVENT",
+            "DTSTAMP:20260101T000000Z",
+            f"DTSTART:{jour:%Y%m%d}T{h:02d}0000Z",
+            f"DTEND:{jour:%Y%m%d}T{h + 2:02d}0000Z",
+            f"SUMMARY:Cours {i} - Algorithmique avancée",
+            f"LOCATION:CC P{1 + i % 4} {100 + i % 40} (30 places)\\,CC P{1 + (i + 1) % 4} P{i % 9}",
+            desc[:75], *[" " + desc[k:k + 74] for k in range(75, len(desc), 74)],
+            f"UID:ADE{i:08d}",
+            "END:VEVENT",
+        ]
+    lignes.append("END:VCALENDAR")
+    return ("\r\n".join(lignes) + "\r\n").encode()
+
+
+def parse_ancien(texte):
+    # Copie du parsing d'avant (fetch_and_parse_ical / update_cache_ade_si_necessaire).
+    events = []
+    cours_liste = texte.split("BEGIN:VEVENT")
+    for cours in cours_liste:
+        if "END:VEVENT" not in cours: continue
+        debut, fin, lieu, summary = None, None, "", ""
+        for ligne in cours.split('\n'):
+            l = ligne.strip()
+            if l.startswith("DTSTART:"):
+                try: debut = datetime.datetime.strptime(l.replace("DTSTART:","").replace("Z","").strip(), '%Y%m%dT%H%M%S')
+                except: pass
+            elif l.startswith("DTEND:"):
+                try: fin = datetime.datetime.strptime(l.replace("DTEND:","").replace("Z","").strip(), '%Y%m%dT%H%M%S')
+                except: pass
+            elif l.startswith("LOCATION:"):
+                lieu = l.replace("LOCATION:", "").replace("\\", "")
+            elif l.startswith("SUMMARY:"):
+                summary = l.replace("SUMMARY:", "").replace("\\", "")
+        if debut and fin:
+            events.append({"titre": summary, "lieu": lieu, "debut": debut, "fin": fin})
+    return events
+
+
+def mesurer(nom, fn):
+    t0 = time.perf_counter()
+    n = fn()
+    duree = (time.perf_counter() - t0) * 1000
+    # deuxième passage pour la mémoire : tracemalloc fausse les temps
+    tracemalloc.start()
+    fn()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {nom:<28} {duree:8.1f} ms  pic mémoire {pic / 1e6:6.1f} Mo  ({n} salles)")
+
+
+def main():
+    backend.MESURES_ACTIVES = False
+    corps = generer_flux(NB_EVENEMENTS)
+    srv, (url,) = campus.demarrer_stub({"/feed.ics": corps})
+    print(f"{NB_EVENEMENTS} événements, {len(corps) / 1e6:.1f} Mo")
+
+    def ancien():
+        # l'ancien code téléchargeait le texte complet (r.text) avant de le découper
+        return sum(len(e["lieu"].split(",")) for e in parse_ancien(backend.get_http_session().get(url).text))
+
+    def flux():
+        # chemin du refresh : corps haché et spoolé sur disque, puis relu par morceaux
+        res = backend.fetch_flux_ade(url)
+        try: return sum(len(e["salles"]) for e in iter_evenements(backend.chunks_fichier(res["fichier"])))
+        finally: backend.fermer_flux([res])
+
+    mesurer("ancien (r.text + split)", ancien)
+    mesurer("fetch_flux_ade + flux", flux)
+    srv.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Mesure du refresh ADE contre un serveur local qui simule mon-edt.u-pec.fr.
+
+Usage : python bench/bench_refresh_ade.py [nb_flux] [latence_ms]
+"""
+import os
+import sys
+import time
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import requests
+import backend
+
+NB_FLUX = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+LATENCE_MS = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+
+ICAL = "BEGIN:VCALENDAR\r\n" + "".join(
+    f"BEGIN:VEVENT\r\nDTSTART:20260105T{8 + i % 10:02d}0000Z\r\nDTEND:20260105T{9 + i % 10:02d}0000Z\r\n"
+    f"SUMMARY:Cours {i}\r\nLOCATION:CC P{1 + i % 4} {100 + i % 40} (30 places)\r\nEND:VEVENT\r\n"
+    for i in range(200)
+) + "END:VCALENDAR\r\n"
+ETAG = '"bench-v1"'
+
+
+class StubADE(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(LATENCE_MS / 1000)
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = ICAL.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/calendar")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StubADE)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    liens = [f"http://127.0.0.1:{srv.server_port}/feed/{i}.ics" for i in range(NB_FLUX)]
+
+    tmp = tempfile.mkdtemp()
+    backend.DB_FILE = os.path.join(tmp, "bench.db")
+    backend.FICHIER_LIENS = os.path.join(tmp, "liens.txt")
+    with open(backend.FICHIER_LIENS, "w", encoding="utf-8") as f:
+        f.write("\n".join(liens))
+    backend.init_db()
+
+    t0 = time.perf_counter()
+    for url in liens: requests.get(url, timeout=5)
+    seq_ms = (time.perf_counter() - t0) * 1000
+
+    stats = backend.update_cache_ade_si_necessaire()
+    stats_304 = backend.update_cache_ade_si_necessaire(force=True)
+    srv.shutdown()
+
+    print(f"{NB_FLUX} flux, latence serveur {LATENCE_MS} ms")
+    print(f"  séquentiel (ancien code) : {seq_ms:8.1f} ms")
+    print(f"  parallèle  (fetch)       : {stats['fetch_ms']:8.1f} ms")
+    print(f"  refresh complet          : {stats['total_ms']:8.1f} ms")
+    print(f"  ingestion cache_ade      : {stats['ingestion_ms']:8.1f} ms  ({stats['lignes']} lignes, {stats['lignes_par_s']} lignes/s)")
+    for f in stats["flux"]:
+        print(f"    {f['status']} {f['duree_ms']:7.1f} ms  {f['url']}")
+    print(f"  refresh suivant (304)    : {stats_304['total_ms']:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Temps des chemins chauds du backend sur un campus synthétique, résultats en JSON.
+
+Usage : python bench/bench_suite.py [sortie.json] [nb_salles_par_etage] [nb_users] [nb_resas] [repetitions]
+Les flux ADE sont servis par un serveur local (campus.py) à la place de mon-edt.u-pec.fr.
+Pour comparer deux versions : lancer le script depuis chacune (git worktree) puis comparer
+les médianes des deux JSON. Les mesures d'instrumentation du backend sont coupées.
+"""
+import os
+import sys
+import json
+import time
+import random
+import datetime
+import tempfile
+import platform
+import statistics
+import subprocess
+
+import campus
+import backend
+
+SORTIE = sys.argv[1] if len(sys.argv) > 1 else "bench_suite.json"
+NB_SALLES = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+NB_USERS = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+NB_RESAS = int(sys.argv[4]) if len(sys.argv) > 4 else 1500
+REPETITIONS = int(sys.argv[5]) if len(sys.argv) > 5 else 20
+NB_FLUX = 8
+GRAINE = 1
+
+
+def chronometrer(fn, repetitions):
+    durees = []
+    for _ in range(repetitions):
+        t0 = time.perf_counter()
+        fn()
+        durees.append((time.perf_counter() - t0) * 1000)
+    durees.sort()
+    return {"repetitions": repetitions, "min_ms": round(durees[0], 3), "mediane_ms": round(statistics.median(durees), 3),
+            "p95_ms": round(durees[min(len(durees) - 1, int(len(durees) * 0.95))], 3), "max_ms": round(durees[-1], 3)}
+
+
+def version_git():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.abspath(backend.__file__))).stdout.strip() or None
+    except OSError: return None
+
+
+def main():
+    rng = random.Random(GRAINE)
+    backend.MESURES_ACTIVES = False
+    salles = campus.salles_campus(NB_SALLES)
+    jours = [campus.LUNDI + datetime.timedelta(days=i) for i in range(7)]
+    flux, nb_evenements = campus.flux_campus(salles, jours, rng, NB_FLUX)
+    srv, liens = campus.demarrer_stub(flux)
+    campus.preparer_base(tempfile.mkdtemp(), liens)
+
+    resultats = {}
+    t0 = time.perf_counter()
+    stats = backend.update_cache_ade_si_necessaire(force=True)
+    resultats["update_cache_ade_si_necessaire (200)"] = {"repetitions": 1, "mediane_ms": round((time.perf_counter() - t0) * 1000, 3),
+                                                        "fetch_ms": stats["fetch_ms"], "ingestion_ms": stats["ingestion_ms"], "lignes": stats["lignes"]}
+    resultats["update_cache_ade_si_necessaire (304)"] = chronometrer(lambda: backend.update_cache_ade_si_necessaire(force=True), 5)
+    resultats["update_cache_ade_si_necessaire (à jour)"] = chronometrer(backend.update_cache_ade_si_necessaire, REPETITIONS)
+    srv.shutdown()
+
+    t0 = time.perf_counter()
+    emails, nb_acceptees = campus.peupler(salles, jours, rng, NB_USERS, NB_RESAS, NB_RESAS // 10)
+    peuplement_ms = (time.perf_counter() - t0) * 1000
+
+    jour = datetime.date.today()
+    etage = [s for s in salles if "CC P1 " in s]
+    planning = backend.get_planning_sql(jour)
+    resas = backend.get_db_reservations(jour)
+    email = emails[0]
+    resultats["get_planning_sql"] = chronometrer(lambda: backend.get_planning_sql(jour), REPETITIONS)
+    resultats["get_db_reservations"] = chronometrer(lambda: backend.get_db_reservations(jour), REPETITIONS)
+    for h in (8, 12, 17):
+        t = datetime.time(h, 30)
+        resultats[f"analyse_salle_intelligente étage P1 {t:%H:%M}"] = chronometrer(
+            lambda: [backend.analyse_salle_intelligente(s, planning, resas, t, email, jour) for s in etage], REPETITIONS)
+    echantillon = rng.sample(emails, min(100, len(emails)))
+    resultats["verifier_quota_hebdo x%d" % len(echantillon)] = chronometrer(
+        lambda: [backend.verifier_quota_hebdo(e, jour) for e in echantillon], REPETITIONS)
+    resultats["get_stats_admin"] = chronometrer(backend.get_stats_admin, REPETITIONS)
+
+    dump = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "version": version_git(),
+        "python": platform.python_version(),
+        "sqlite": backend.sqlite3.sqlite_version,
+        "parametres": {"salles": len(salles), "salles_etage_p1": len(etage), "flux": NB_FLUX, "evenements": nb_evenements,
+                       "users": NB_USERS, "reservations_demandees": NB_RESAS, "reservations_acceptees": nb_acceptees,
+                       "repetitions": REPETITIONS, "graine": GRAINE},
+        "peuplement_ms": round(peuplement_ms, 1),
+        "resultats": resultats,
+    }
+    with open(SORTIE, "w", encoding="utf-8") as f:
+        json.dump(dump, f, ensure_ascii=False, indent=1)
+    print(f"{len(salles)} salles, {nb_evenements} cours, {NB_USERS} comptes, {nb_acceptees} réservations -> {SORTIE}")
+    for nom, r in resultats.items():
+        print(f"  {nom:<42} {r['mediane_ms']:9.2f} ms" + (f"  (p95 {r['p95_ms']:.2f})" if "p95_ms" in r else ""))
+
+
+if __name__ == "__main__":
+    main()
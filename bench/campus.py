@@ -0,0 +1,124 @@
+"""Campus synthétique partagé par les scripts de bench : flux ADE, serveur local et base peuplée.
+
+Tout est tiré d'un random.Random(graine) : deux lancements avec les mêmes paramètres
+produisent les mêmes flux et la même base, décalés sur la semaine en cours.
+"""
+import os
+import sys
+import time
+import hashlib
+import datetime
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import backend
+
+ETAGES = ["P1", "P2", "P3", "P4"]
+# semaine en cours : get_stats_admin() et le balayage no-show regardent aujourd'hui
+LUNDI = datetime.date.today() - datetime.timedelta(days=datetime.date.today().weekday())
+
+
+def salles_campus(nb_par_etage):
+    # Mélange des trois niveaux : "CC P1 P03" (parking), "CC P1 012" (0), "CC P1 113" (1)
+    salles = []
+    for etage in ETAGES:
+        for i in range(nb_par_etage):
+            suffixe = f"P{i % 10:02d}" if i % 7 == 0 else f"{i % 2}{i:02d}"
+            salles.append(f"CC {etage} {suffixe}")
+    return sorted(set(salles))
+
+
+def generer_flux(salles, jours, rng, max_cours=6):
+    # Un VEVENT par cours, heures UTC comme mon-edt, parfois deux salles dans LOCATION.
+    lignes = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//ADE/version 6.0"]
+    n = 0
+    for jour in jours:
+        for salle in salles:
+            for _ in range(rng.randint(0, max_cours)):
+                debut = datetime.datetime.combine(jour, datetime.time(rng.randint(6, 16), rng.choice([0, 15, 30, 45])))
+                fin = debut + datetime.timedelta(minutes=rng.choice([60, 90, 120, 180]))
+                lieu = f"{salle} (30 places)"
+                if rng.random() < 0.05: lieu += f"\\,{rng.choice(salles)} (30 places)"
+                lignes += ["BEGIN:VEVENT", "DTSTAMP:20260101T000000Z",
+                           f"DTSTART:{debut:%Y%m%dT%H%M%S}Z", f"DTEND:{fin:%Y%m%dT%H%M%S}Z",
+                           f"SUMMARY:Cours {n % 300} - Groupe {n % 12}", f"LOCATION:{lieu}",
+                           f"UID:ADE{n:08d}", "END:VEVENT"]
+                n += 1
+    lignes.append("END:VCALENDAR")
+    return ("\r\n".join(lignes) + "\r\n").encode(), n
+
+
+class StubADE(BaseHTTPRequestHandler):
+    # Remplace mon-edt.u-pec.fr : server.flux = {chemin: corps}, ETag = hash du corps.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(self.server.latence_ms / 1000)
+        corps = self.server.flux.get(self.path)
+        if corps is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"%s"' % hashlib.sha1(corps).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/calendar")
+        self.send_header("Content-Length", str(len(corps)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, *args):
+        pass
+
+
+def demarrer_stub(flux, latence_ms=0):
+    # flux = {"/feed/0.ics": corps} ; renvoie (serveur, liens)
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), StubADE)
+    srv.flux, srv.latence_ms = flux, latence_ms
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, [f"http://127.0.0.1:{srv.server_port}{chemin}" for chemin in flux]
+
+
+def flux_campus(salles, jours, rng, nb_flux):
+    # Un flux par paquet de salles, comme les exports ADE par bâtiment/étage
+    flux, nb_evenements = {}, 0
+    for i in range(nb_flux):
+        corps, n = generer_flux(salles[i::nb_flux], jours, rng)
+        flux[f"/feed/{i}.ics"] = corps
+        nb_evenements += n
+    return flux, nb_evenements
+
+
+def preparer_base(dossier, liens):
+    backend.DB_FILE = os.path.join(dossier, "campus.db")
+    backend.FICHIER_LIENS = os.path.join(dossier, "liens.txt")
+    with open(backend.FICHIER_LIENS, "w", encoding="utf-8") as f:
+        f.write("\n".join(liens))
+    backend.init_db()
+
+
+def peupler(salles, jours, rng, nb_users, nb_resas, nb_restrictions):
+    # Comptes, réservations (1 ou 2 h, groupes de 1 à 5) et blocages admin, via le backend.
+    emails = [f"etu{i:05d}@u-pec.fr" for i in range(nb_users)]
+    for i, email in enumerate(emails): backend.creer_compte(email, "bench", f"Etu {i}")
+    acceptees = 0
+    for _ in range(nb_resas):
+        salle, jour, h = rng.choice(salles), rng.choice(jours), rng.randint(8, 18)
+        createur = rng.choice(emails)
+        status, _ = backend.manage_clic_salle(createur, salle, jour, datetime.time(h, 0), datetime.time(min(h + rng.randint(1, 2), 20), 0), False)
+        if status != "ok": continue
+        acceptees += 1
+        for membre in rng.sample(emails, rng.randint(0, 4)):
+            if membre != createur: backend.manage_group_action(membre, salle, jour, datetime.time(h, 0), "join")
+    for _ in range(nb_restrictions):
+        type_rest = rng.choice(["BLOCK", "GROUP", "DAY_BLOCK"])
+        backend.set_restriction(rng.choice(salles), rng.choice(jours), -1 if type_rest == "DAY_BLOCK" else rng.randint(8, 19), type_rest)
+    return emails, acceptees
@@ -0,0 +1,151 @@
+"""Test de charge : des centaines d'étudiants sur le radar à l'heure pile.
+
+Usage : python bench/charge.py [nb_users] [nb_process] [actions_par_user] [nb_salles_par_etage]
+Chaque process fait tourner ses utilisateurs dans des threads lâchés ensemble (barrière),
+sur une base locale et des flux ADE servis par campus.py. Mélange d'actions :
+consultation de l'étage, réservation (quota puis manage_clic_salle), rejoindre / quitter
+un groupe, check-in, mes réservations.
+Rapporte le débit, les latences par action, les erreurs de verrou SQLite et les
+invariants violés (double réservation, groupe au-delà de MIN_GROUPE, quota dépassé).
+Code de sortie 1 si un invariant est violé ou en cas d'exception.
+"""
+import sys
+import time
+import random
+import sqlite3
+import datetime
+import tempfile
+import threading
+import multiprocessing
+
+import campus
+import backend
+
+NB_USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+NB_PROCESS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+ACTIONS_PAR_USER = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+NB_SALLES = int(sys.argv[4]) if len(sys.argv) > 4 else 12
+JOUR = datetime.date.today()
+ACTIONS = {"consulter": 50, "reserver": 15, "rejoindre": 15, "quitter": 5, "check-in": 10, "mes_reservations": 5}
+
+
+def simuler(db_file, salles, emails, graine):
+    backend.DB_FILE = db_file
+    backend.MESURES_ACTIVES = False
+    rng = random.Random(graine)
+    latences = {a: [] for a in ACTIONS}
+    erreurs = {"verrou": 0, "exceptions": []}
+    lock = threading.Lock()
+    barriere = threading.Barrier(len(emails))
+    par_etage = {}
+    for s in salles: par_etage.setdefault(backend.classer_salle(s)[1], []).append(s)
+
+    def utilisateur(email, rng):
+        barriere.wait()
+        for _ in range(ACTIONS_PAR_USER):
+            action = rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+            h = rng.randint(8, 18)
+            t0 = time.perf_counter()
+            try:
+                if action == "consulter":
+                    etage = rng.choice(list(par_etage))
+                    backend.analyser_salles(backend.get_index_jour(JOUR), par_etage[etage], datetime.time(h, 0), email)
+                elif action == "reserver":
+                    if backend.verifier_quota_hebdo(email, JOUR)[0]:
+                        backend.manage_clic_salle(email, rng.choice(salles), JOUR, datetime.time(h, 0), datetime.time(h + rng.randint(1, 2), 0), False)
+                elif action == "rejoindre":
+                    # une réservation vue sur le radar, peut-être déjà complète depuis
+                    resas = backend.get_db_reservations(JOUR)
+                    if resas:
+                        salle, debut = rng.choice(resas)[:2]
+                        backend.manage_group_action(email, salle, JOUR, datetime.datetime.strptime(debut, "%H:%M").time(), "join")
+                elif action == "quitter":
+                    mes = [r for r in backend.get_mes_reservations_futures(email) if r[1] == JOUR.strftime("%Y-%m-%d")]
+                    if mes:
+                        salle, _, debut = rng.choice(mes)[:3]
+                        backend.manage_group_action(email, salle, JOUR, datetime.datetime.strptime(debut, "%H:%M").time(), "leave")
+                elif action == "check-in":
+                    mes = backend.get_mes_reservations_futures(email)
+                    if mes: backend.confirm_reservation_user(rng.choice(mes)[5], email)
+                else:
+                    backend.get_mes_reservations_futures(email)
+            except sqlite3.OperationalError as e:
+                with lock:
+                    if backend._est_verrou(e): erreurs["verrou"] += 1
+                    else: erreurs["exceptions"].append(f"{action}: {e!r}")
+                continue
+            except Exception as e:
+                with lock: erreurs["exceptions"].append(f"{action}: {e!r}")
+                continue
+            with lock: latences[action].append((time.perf_counter() - t0) * 1000)
+            time.sleep(rng.uniform(0, 0.02))
+
+    threads = [threading.Thread(target=utilisateur, args=(e, random.Random(rng.random()))) for e in emails]
+    t0 = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return latences, erreurs, time.perf_counter() - t0
+
+
+def percentile(valeurs, p):
+    return valeurs[min(len(valeurs) - 1, int(len(valeurs) * p / 100))] if valeurs else 0.0
+
+
+def verifier_invariants():
+    conn = backend.get_conn()
+    c = conn.cursor()
+    c.execute("""SELECT a.id, b.id, a.salle, a.start_time, a.end_time, b.start_time, b.end_time
+                 FROM reservations a JOIN reservations b ON a.salle = b.salle AND a.date_str = b.date_str AND a.id < b.id
+                 WHERE a.start_time < b.end_time AND b.start_time < a.end_time""")
+    doublons = c.fetchall()
+    c.execute("SELECT reservation_id, COUNT(*) FROM reservation_members GROUP BY reservation_id HAVING COUNT(*) > ?", (backend.MIN_GROUPE,))
+    groupes = c.fetchall()
+    debut = JOUR - datetime.timedelta(days=JOUR.weekday())
+    c.execute("SELECT user_email, COUNT(*) FROM reservation_members WHERE date_str >= ? AND date_str <= ? GROUP BY user_email HAVING COUNT(*) > ?",
+              (debut.strftime("%Y-%m-%d"), (debut + datetime.timedelta(days=6)).strftime("%Y-%m-%d"), backend.MAX_QUOTA_HEBDO))
+    quotas = c.fetchall()
+    c.execute("SELECT COUNT(*), (SELECT COUNT(*) FROM reservation_members) FROM reservations")
+    nb_resas, nb_membres = c.fetchone()
+    conn.close()
+    return {"double_reservation": doublons, "groupe_au_dela_de_MIN_GROUPE": groupes, "quota_depasse": quotas}, nb_resas, nb_membres
+
+
+def main():
+    rng = random.Random(1)
+    salles = campus.salles_campus(NB_SALLES)
+    flux, _ = campus.flux_campus(salles, [JOUR], rng, 4)
+    srv, liens = campus.demarrer_stub(flux)
+    campus.preparer_base(tempfile.mkdtemp(), liens)
+    backend.update_cache_ade_si_necessaire(force=True)
+    srv.shutdown()
+    emails = [f"etu{i:05d}@u-pec.fr" for i in range(NB_USERS)]
+    for i, email in enumerate(emails): backend.creer_compte(email, "charge", f"Etu {i}")
+
+    lots = [(backend.DB_FILE, salles, emails[p::NB_PROCESS], p) for p in range(NB_PROCESS)]
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(NB_PROCESS) as pool:
+        resultats = pool.starmap(simuler, lots)
+    duree = time.perf_counter() - t0
+
+    latences = {a: sorted(l for r in resultats for l in r[0][a]) for a in ACTIONS}
+    verrous = sum(r[1]["verrou"] for r in resultats)
+    exceptions = [e for r in resultats for e in r[1]["exceptions"]]
+    nb_actions = sum(len(l) for l in latences.values())
+    violations, nb_resas, nb_membres = verifier_invariants()
+
+    print(f"{NB_USERS} utilisateurs ({NB_PROCESS} process), {len(salles)} salles, {ACTIONS_PAR_USER} actions chacun")
+    print(f"  {nb_actions} actions en {duree:.1f} s : {nb_actions / duree:.0f} actions/s")
+    print(f"  {'action':<18} {'nb':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for a, l in latences.items():
+        print(f"  {a:<18} {len(l):>6} {percentile(l, 50):8.1f} {percentile(l, 95):8.1f} {percentile(l, 99):8.1f} {(l[-1] if l else 0):8.1f}")
+    print(f"  erreurs de verrou {verrous}, exceptions {len(exceptions)}")
+    print(f"  en base : {nb_resas} réservations, {nb_membres} membres")
+    for nom, lignes in violations.items():
+        print(f"  {nom:<30} {len(lignes)}")
+        for l in lignes[:5]: print(f"    {l}")
+    for e in exceptions[:5]: print(f"  EXCEPTION {e}")
+    sys.exit(1 if exceptions or any(violations.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
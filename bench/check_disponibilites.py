@@ -0,0 +1,76 @@
+"""Compare le moteur de disponibilité à analyse_salle_intelligente() sur des données aléatoires.
+
+Usage : python bench/check_disponibilites.py [nb_salles] [graine]
+Code de sortie 1 au premier écart.
+"""
+import os
+import sys
+import time
+import random
+import datetime
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import backend
+
+NB_SALLES = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+GRAINE = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+EMAILS = [f"etu{i}@u-pec.fr" for i in range(8)]
+
+
+def peupler(rng, jour):
+    salles = [f"CC P{1 + i % 4} {100 + i}" for i in range(NB_SALLES)]
+    conn = backend.get_conn()
+    c = conn.cursor()
+    for s in salles:
+        for _ in range(rng.randint(0, 6)):
+            h, m = rng.randint(7, 19), rng.choice([0, 15, 30, 45])
+            debut = datetime.datetime.combine(jour, datetime.time(h, m))
+            fin = debut + datetime.timedelta(minutes=rng.choice([45, 60, 90, 120, 180]))
+            c.execute("INSERT INTO cache_ade VALUES (?, ?, ?, 'check')", (s, debut.isoformat(), fin.isoformat()))
+        for _ in range(rng.randint(0, 3)):
+            h = rng.randint(8, 19)
+            parts = ",".join(rng.sample(EMAILS, rng.randint(0, 5)))
+            c.execute("INSERT INTO reservations (user_email, salle, date_str, start_time, end_time, participants, confirmed_list) VALUES (?, ?, ?, ?, ?, ?, '')",
+                      (rng.choice(EMAILS), s, jour.strftime("%Y-%m-%d"), f"{h:02d}:00", f"{min(h + rng.randint(1, 2), 20):02d}:00", parts))
+        for _ in range(rng.randint(0, 2)):
+            c.execute("INSERT INTO restrictions VALUES (?, ?, ?, ?)",
+                      (s, jour.strftime("%Y-%m-%d"), rng.choice([-1] + list(range(8, 21))), rng.choice(["BLOCK", "GROUP", "DAY_BLOCK"])))
+    conn.commit()
+    conn.close()
+    return salles
+
+
+def main():
+    rng = random.Random(GRAINE)
+    backend.DB_FILE = os.path.join(tempfile.mkdtemp(), "dispo.db")
+    backend.init_db()
+    jour = datetime.date(2026, 1, 5)
+    salles = peupler(rng, jour)
+    planning = backend.get_planning_sql(jour)
+    resas = backend.get_db_reservations(jour)
+
+    t_ancien = t_index = 0.0
+    for h in range(8, 21):
+        for m in (0, 30):
+            t = datetime.time(h, m) if h < 20 else datetime.time(20, 0)
+            email = rng.choice(EMAILS)
+            t0 = time.perf_counter()
+            attendu = {s: backend.analyse_salle_intelligente(s, planning, resas, t, email, jour) for s in salles}
+            t1 = time.perf_counter()
+            index = backend.construire_index_jour(jour, planning, resas)
+            obtenu = backend.analyser_salles(index, salles, t, email)
+            t2 = time.perf_counter()
+            t_ancien += t1 - t0
+            t_index += t2 - t1
+            for s in salles:
+                if attendu[s] != obtenu[s]:
+                    print(f"ÉCART {s} {t} {email}: {attendu[s]} != {obtenu[s]}")
+                    sys.exit(1)
+    print(f"{len(salles)} salles x 26 créneaux : identique")
+    print(f"  analyse_salle_intelligente : {t_ancien * 1000:8.1f} ms")
+    print(f"  index + analyser_salles    : {t_index * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
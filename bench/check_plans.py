@@ -0,0 +1,26 @@
+"""Vérifie que chaque requête chaude passe par un index (EXPLAIN QUERY PLAN).
+
+Usage : python bench/check_plans.py [chemin_db]
+Sans argument, une base vide est créée dans un dossier temporaire et migrée.
+Code de sortie 1 si une requête fait un SCAN complet.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import backend
+
+
+def main():
+    backend.DB_FILE = sys.argv[1] if len(sys.argv) > 1 else os.path.join(tempfile.mkdtemp(), "plans.db")
+    backend.init_db()
+    ko = 0
+    for nom, (ok, plan) in backend.verifier_plans_requetes().items():
+        print(f"{'OK  ' if ok else 'SCAN'} {nom:<34} {plan}")
+        ko += not ok
+    sys.exit(1 if ko else 0)
+
+
+if __name__ == "__main__":
+    main()
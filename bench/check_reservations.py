@@ -0,0 +1,76 @@
+"""Rafale de réservations concurrentes sur quelques salles : aucune double réservation tolérée.
+
+Usage : python bench/check_reservations.py [nb_reservations] [nb_process]
+Chaque process lance ses réservations dans des threads synchronisés sur une barrière,
+tous sur la même base. Code de sortie 1 en cas de chevauchement ou d'exception.
+"""
+import os
+import sys
+import time
+import random
+import datetime
+import tempfile
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import backend
+
+NB_RESERVATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+NB_PROCESS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+SALLES = [f"CC P1 {100 + i}" for i in range(4)]
+JOUR = datetime.date(2026, 1, 5)
+
+
+def rafale(db_file, graine, nb):
+    backend.DB_FILE = db_file
+    rng = random.Random(graine)
+    barriere = threading.Barrier(nb)
+    resultats = []
+
+    def reserver(i):
+        salle, h = rng.choice(SALLES), rng.randint(9, 12)
+        barriere.wait()
+        try: status, msg = backend.manage_clic_salle(f"etu{graine}_{i}@u-pec.fr", salle, JOUR, datetime.time(h, 0), datetime.time(h + rng.choice([1, 2]), 0), False)
+        except Exception as e: status, msg = "exception", repr(e)
+        resultats.append((status, msg))
+
+    threads = [threading.Thread(target=reserver, args=(i,)) for i in range(nb)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return resultats
+
+
+def main():
+    db_file = os.path.join(tempfile.mkdtemp(), "resa.db")
+    backend.DB_FILE = db_file
+    backend.init_db()
+
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(NB_PROCESS) as pool:
+        lots = pool.starmap(rafale, [(db_file, p, NB_RESERVATIONS // NB_PROCESS) for p in range(NB_PROCESS)])
+    duree = time.perf_counter() - t0
+    resultats = [r for lot in lots for r in lot]
+
+    conn = backend.get_conn()
+    c = conn.cursor()
+    c.execute("""SELECT a.id, b.id, a.salle, a.start_time, a.end_time, b.start_time, b.end_time
+                 FROM reservations a JOIN reservations b ON a.salle = b.salle AND a.date_str = b.date_str AND a.id < b.id
+                 WHERE a.start_time < b.end_time AND b.start_time < a.end_time""")
+    doublons = c.fetchall()
+    c.execute("SELECT COUNT(*) FROM reservations")
+    nb_resas = c.fetchone()[0]
+    conn.close()
+
+    gagnants = sum(1 for s, _ in resultats if s == "ok")
+    exceptions = [m for s, m in resultats if s == "exception"]
+    print(f"{len(resultats)} réservations ({NB_PROCESS} process) en {duree * 1000:.0f} ms")
+    print(f"  acceptées {gagnants}, refusées {len(resultats) - gagnants - len(exceptions)}, exceptions {len(exceptions)}")
+    print(f"  lignes en base {nb_resas}, chevauchements {len(doublons)}")
+    for d in doublons[:10]: print(f"  CHEVAUCHEMENT {d}")
+    for m in exceptions[:5]: print(f"  EXCEPTION {m}")
+    sys.exit(1 if doublons or exceptions or nb_resas != gagnants else 0)
+
+
+if __name__ == "__main__":
+    main()
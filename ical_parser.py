@@ -0,0 +1,126 @@
+import codecs
+import re
+import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Parseur iCal (RFC 5545) en flux, partagé par le cache campus et les plannings perso.
+# Il consomme des morceaux (bytes ou str) au fil de l'eau : seule la ligne en cours
+# et l'événement en cours sont gardés en mémoire.
+
+FUSEAU_LOCAL = "Europe/Paris"
+UTC = datetime.timezone.utc
+_ECHAPPEMENT = re.compile(r"\\(.)")
+_SEPARATEUR_SALLES = re.compile(r",(?![^(]*\))")
+_PROPRIETES_UTILES = ("BEGIN", "END", "DTSTART", "DTEND", "LOCATION", "SUMMARY")
+
+
+@lru_cache(maxsize=32)
+def _zone(nom):
+    try: return ZoneInfo(nom)
+    except (ZoneInfoNotFoundError, ValueError): return None
+
+
+def _iter_lignes_brutes(chunks):
+    if isinstance(chunks, (str, bytes)): chunks = [chunks]
+    decodeur = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    reste = ""
+    for chunk in chunks:
+        if isinstance(chunk, bytes): chunk = decodeur.decode(chunk)
+        lignes = (reste + chunk).split("\n")
+        reste = lignes.pop()
+        yield from lignes
+    reste += decodeur.decode(b"", final=True)
+    if reste: yield reste
+
+
+def iter_lignes_depliees(chunks):
+    # Recolle les lignes pliées (une continuation commence par un espace ou une tabulation).
+    courante = None
+    for ligne in _iter_lignes_brutes(chunks):
+        ligne = ligne.rstrip("\r")
+        if ligne[:1] in (" ", "\t"):
+            if courante is not None: courante += ligne[1:]
+            continue
+        if courante: yield courante
+        courante = ligne
+    if courante: yield courante
+
+
+def decouper_ligne(ligne):
+    # "NOM;PARAM=val;...:valeur" -> (NOM, {PARAM: val}, valeur). Les ':' entre guillemets
+    # (valeurs de paramètres) ne comptent pas comme séparateur.
+    i = ligne.find(":")
+    if i < 0: return ligne.upper(), {}, ""
+    if '"' in ligne[:i]:
+        entre_guillemets = False
+        for i, ch in enumerate(ligne):
+            if ch == '"': entre_guillemets = not entre_guillemets
+            elif ch == ":" and not entre_guillemets: break
+    tete, valeur = ligne[:i], ligne[i + 1:]
+    if ";" not in tete: return tete.upper(), {}, valeur
+    nom, *params_bruts = tete.split(";")
+    params = {}
+    for p in params_bruts:
+        k, _, v = p.partition("=")
+        params[k.upper()] = v.strip('"')
+    return nom.upper(), params, valeur
+
+
+def unescape_texte(valeur):
+    if "\\" not in valeur: return valeur
+    return _ECHAPPEMENT.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), valeur)
+
+
+def decouper_salles(lieu):
+    # Une LOCATION ADE peut lister plusieurs salles séparées par des virgules ;
+    # on ne coupe pas à l'intérieur des parenthèses ("CC P1 101 (30 places, PC)").
+    return [s.strip() for s in _SEPARATEUR_SALLES.split(lieu) if s.strip()]
+
+
+def parse_date_ical(valeur, params):
+    # Renvoie un datetime naïf à l'heure de FUSEAU_LOCAL, comme le reste de l'appli.
+    if params.get("VALUE") == "DATE": return _parse_date(valeur.strip()[:8], None)
+    return _parse_date(valeur.strip(), params.get("TZID"))
+
+
+@lru_cache(maxsize=8192)
+def _parse_date(v, tzid):
+    # Les mêmes créneaux reviennent des milliers de fois dans un flux : on met en cache.
+    try:
+        if len(v) == 8: return datetime.datetime(int(v[0:4]), int(v[4:6]), int(v[6:8]))
+        dt = datetime.datetime(int(v[0:4]), int(v[4:6]), int(v[6:8]), int(v[9:11]), int(v[11:13]), int(v[13:15]))
+    except (ValueError, IndexError):
+        return None
+    local = _zone(FUSEAU_LOCAL)
+    if v.endswith("Z"): tz = UTC
+    elif tzid: tz = _zone(tzid)
+    else: tz = None
+    if tz is None or local is None: return dt
+    return dt.replace(tzinfo=tz).astimezone(local).replace(tzinfo=None)
+
+
+def iter_evenements(chunks):
+    # Générateur de VEVENT : {"titre", "lieu", "salles", "debut", "fin"}.
+    # Les sous-composants (VALARM...) sont ignorés, les événements sans dates aussi.
+    ev, profondeur = None, 0
+    for ligne in iter_lignes_depliees(chunks):
+        if not ligne.startswith(_PROPRIETES_UTILES): continue
+        nom, params, valeur = decouper_ligne(ligne)
+        if nom == "BEGIN":
+            if ev is not None: profondeur += 1
+            elif valeur.strip().upper() == "VEVENT": ev, profondeur = {"titre": "", "lieu": "", "debut": None, "fin": None}, 0
+            continue
+        if nom == "END":
+            if ev is None: continue
+            if profondeur: profondeur -= 1; continue
+            if ev["debut"] and ev["fin"]:
+                ev["salles"] = decouper_salles(ev["lieu"])
+                yield ev
+            ev = None
+            continue
+        if ev is None or profondeur: continue
+        if nom == "DTSTART": ev["debut"] = parse_date_ical(valeur, params)
+        elif nom == "DTEND": ev["fin"] = parse_date_ical(valeur, params)
+        elif nom == "LOCATION": ev["lieu"] = unescape_texte(valeur)
+        elif nom == "SUMMARY": ev["titre"] = unescape_texte(valeur)